@@ -1,15 +1,22 @@
 import streamlit as st
 import pandas as pd
-from collections import Counter
+import numpy as np
+from collections import Counter, OrderedDict
 import gspread
 from google.oauth2.service_account import Credentials
 import requests
 from datetime import datetime, timedelta
 import pytz
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import base64
+import hashlib
+import math
 import re
 from bs4 import BeautifulSoup 
+from espelho_local import DivergenciaEspelho, espelhar
 
 # =============================================================================
 # --- 1. CONFIGURAÇÕES VISUAIS E SOM ---
@@ -61,6 +68,26 @@ CONFIG_BANCAS = {
 
 BANCA_OPCOES = list(CONFIG_BANCAS.keys())
 
+# --- SONDA DE SITES (SEGUNDOS ENTRE CHECAGENS) ---
+SONDA_TTL_POS_SORTEIO = 60    # até 30 min depois de um horário da grade
+SONDA_TTL_PADRAO = 600
+SONDA_INTERVALO_LOOP = 15
+
+# --- SETORES DA ESTRATÉGIA BMA (CRISE + TENDÊNCIA) ---
+SETORES_BMA_CT = {"BAIXO": range(1, 9), "MÉDIO": range(9, 17), "ALTO": range(17, 25)}
+
+# --- CICLOS (BIT g-1 LIGADO = GRUPO g JÁ SAIU NO CICLO) ---
+MASCARA_CICLO_COMPLETO = (1 << 25) - 1
+PERCENTIS_CICLO = (10, 25, 50, 75, 90)
+
+# --- SETORES PADRÃO (TABELA DE STRESS) ---
+SETORES_BMA = {
+    "BAIXO (01-08)": range(1, 9),
+    "MÉDIO (09-16)": range(9, 17),
+    "ALTO (17-24)": range(17, 25),
+    "VACA (25)": [25]
+}
+
 # Estados de Som
 if 'tocar_som_salvar' not in st.session_state: st.session_state['tocar_som_salvar'] = False
 if 'tocar_som_apagar' not in st.session_state: st.session_state['tocar_som_apagar'] = False
@@ -107,36 +134,127 @@ def aplicar_estilo_banca(banca_key):
 # =============================================================================
 # --- 2. FUNÇÕES DE BANCO DE DADOS ---
 # =============================================================================
-def conectar_planilha(nome_aba):
+# Cliente e planilha vivem no processo (compartilhados entre reruns e sessões).
+# O google-auth renova o token de acesso sozinho quando expira, então um rerun
+# não faz nenhuma troca de OAuth nem busca por nome no Drive.
+# Falhas levantam exceção de propósito: o cache_resource não guarda exceções,
+# assim uma queda momentânea não fica "presa" como None.
+@st.cache_resource(show_spinner=False)
+def abrir_central():
     scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    credentials = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=scopes)
+    gc = gspread.authorize(credentials)
+    return gc.open("CentralBichos")
+
+# A aba vem envolvida pelo espelho local (SQLite): leituras saem do disco/memória,
+# gravações vão para a planilha numa fila em segundo plano (ver espelho_local.py).
+@st.cache_resource(show_spinner=False)
+def abrir_aba(nome_aba):
+    return espelhar(abrir_central().worksheet(nome_aba))
+
+def conectar_planilha(nome_aba):
     if "gcp_service_account" in st.secrets:
-        creds_dict = st.secrets["gcp_service_account"]
-        credentials = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        gc = gspread.authorize(credentials)
-        try:
-            sh = gc.open("CentralBichos")
-            worksheet = sh.worksheet(nome_aba)
-            return worksheet
+        try: return abrir_aba(nome_aba)
         except: return None
     return None
 
+# Linhas já lidas de cada aba ficam no processo: {id_aba: {"linhas": [...], "grupos": [...], ...}}
+# len(linhas) é também o número da última linha ocupada da aba; nossos próprios
+# appends e deletes mantêm esse índice em dia sem reler a planilha.
+@st.cache_resource(show_spinner=False)
+def memoria_abas():
+    return {"lock": threading.Lock(), "abas": {}, "travas": {}}
+
+def trava_da_aba(memoria, worksheet):
+    # Uma trava por aba (a leitura da rede acontece com ela na mão): bancas diferentes
+    # sincronizam ao mesmo tempo; a trava geral só protege a criação das travas
+    with memoria["lock"]: return memoria["travas"].setdefault(worksheet.id, threading.Lock())
+
+def ler_linhas_aba(worksheet, linha_inicial=1):
+    # Um único batch_get cobre grupo, horário e data (colunas A:C)
+    return [list(r) for r in worksheet.batch_get([f"A{linha_inicial}:C"])[0]]
+
+def colunas_das_linhas(linhas):
+    # Só linhas com grupo válido; horário e data ficam alinhados ao grupo
+    validas = [r for r in linhas if r and r[0].isdigit()]
+    return ([int(r[0]) for r in validas],
+            [r[1].strip() if len(r) > 1 else "" for r in validas],
+            [r[2].strip() if len(r) > 2 else "" for r in validas])
+
+def novo_cache_aba(linhas):
+    grupos, horarios, datas = colunas_das_linhas(linhas)
+    return {"linhas": linhas, "grupos": grupos, "horarios": horarios, "datas": datas, "colunar": None}
+
+def estender_cache_aba(cache, novas):
+    grupos, horarios, datas = colunas_das_linhas(novas)
+    cache["linhas"].extend(novas); cache["grupos"].extend(grupos)
+    cache["horarios"].extend(horarios); cache["datas"].extend(datas)
+    cache["colunar"] = None
+
+def sincronizar_cache_aba(worksheet, memoria):
+    # Chamar com trava_da_aba(memoria, worksheet) na mão
+    cache = memoria["abas"].get(worksheet.id)
+    if cache and cache["linhas"]:
+        # Busca só a cauda, a partir da última linha conhecida (que serve de conferência)
+        total = len(cache["linhas"])
+        try: cauda = ler_linhas_aba(worksheet, total)
+        except: cauda = []
+        if cauda and cauda[0] == cache["linhas"][-1]:
+            if len(cauda) > 1: estender_cache_aba(cache, cauda[1:])
+        else: cache = None  # Aba encolheu ou mudou por fora: recarga completa
+    if not cache or not cache["linhas"]:
+        cache = novo_cache_aba(ler_linhas_aba(worksheet))
+        memoria["abas"][worksheet.id] = cache
+    return cache
+
 def carregar_dados(worksheet):
     if worksheet:
-        valores = worksheet.col_values(1)
-        grupos = [int(v) for v in valores if v.isdigit()]
-        try:
-            horarios = worksheet.col_values(2)
-            ultimo_horario = horarios[-1] if horarios else ""
-        except: ultimo_horario = ""
-        return grupos, ultimo_horario
+        memoria = memoria_abas()
+        with trava_da_aba(memoria, worksheet):
+            cache = sincronizar_cache_aba(worksheet, memoria)
+            ultimo_horario = ""
+            for r in reversed(cache["linhas"]):
+                if len(r) > 1 and r[1]: ultimo_horario = r[1]; break
+            return list(cache["grupos"]), ultimo_horario
     return [], ""
 
+def carregar_historico_colunar(worksheet):
+    # Histórico tipado em colunas: grupo (uint8), horário (código int16 + rótulos; -1 = sem horário)
+    # e data (datetime64[D]; NaT se inválida). Montado uma vez por versão do cache da aba.
+    if not worksheet: return None
+    memoria = memoria_abas()
+    with trava_da_aba(memoria, worksheet):
+        cache = sincronizar_cache_aba(worksheet, memoria)
+        if cache["colunar"] is None:
+            codigos, rotulos = pd.factorize(pd.Series(cache["horarios"], dtype=object).replace("", None))
+            cache["colunar"] = {
+                "grupo": np.asarray(cache["grupos"], dtype=np.uint8),
+                "horario": codigos.astype(np.int16),
+                "rotulos_horario": list(rotulos),
+                "data": pd.to_datetime(pd.Series(cache["datas"], dtype=object), format="%Y-%m-%d", errors="coerce").values.astype("datetime64[D]"),
+            }
+        return cache["colunar"]
+
+def linha_do_append(resposta):
+    # A resposta do append traz o intervalo gravado (ex: "LOTEP!A1235:C1235")
+    try:
+        m = re.search(r'![A-Z]+(\d+)', resposta["updates"]["updatedRange"])
+        return int(m.group(1)) if m else None
+    except: return None
+
 def salvar_na_nuvem(worksheet, dados_jogo, horario):
     if worksheet:
         try:
             data_hoje = datetime.now().strftime("%Y-%m-%d")
             linha = [int(dados_jogo), str(horario), data_hoje]
-            worksheet.append_row(linha)
+            resposta = worksheet.append_row(linha)
+            memoria = memoria_abas()
+            with trava_da_aba(memoria, worksheet):
+                cache = memoria["abas"].get(worksheet.id)
+                if cache is not None:
+                    if linha_do_append(resposta) == len(cache["linhas"]) + 1:
+                        estender_cache_aba(cache, [[str(v) for v in linha]])
+                    else: memoria["abas"].pop(worksheet.id, None)  # Índice fora de sincronia: relê na próxima carga
             return True
         except: return False
     return False
@@ -144,14 +262,36 @@ def salvar_na_nuvem(worksheet, dados_jogo, horario):
 def deletar_ultimo_registro(worksheet):
     if worksheet:
         try:
-            todos = worksheet.get_all_values()
-            total_linhas = len(todos)
-            if total_linhas > 0:
-                worksheet.delete_rows(total_linhas)
+            memoria = memoria_abas()
+            with trava_da_aba(memoria, worksheet):
+                # Confere antes de apagar: a leitura A{total}:C tem que trazer só a última linha
+                # conhecida; se a aba mudou por fora, o cache se ajusta e vale a última linha real.
+                # O espelho confere de novo com a planilha e recusa (DivergenciaEspelho) se ela mudou.
+                for tentativa in range(2):
+                    cache = sincronizar_cache_aba(worksheet, memoria)
+                    total_linhas = len(cache["linhas"])
+                    if total_linhas == 0: return False
+                    try:
+                        worksheet.delete_rows(total_linhas); break
+                    except DivergenciaEspelho: memoria["abas"].pop(worksheet.id, None)
+                else: return False
+                removida = cache["linhas"].pop()
+                if removida and removida[0].isdigit() and cache["grupos"]:
+                    for coluna in ("grupos", "horarios", "datas"): cache[coluna].pop()
+                cache["colunar"] = None
                 return True
         except: return False
     return False
 
+def mostrar_situacao_fila(worksheet):
+    # Gravações que ainda não chegaram na planilha (fila do espelho local)
+    if not worksheet: return
+    situacao = worksheet.situacao_fila()
+    if situacao["erro"]: st.warning(f"⚠️ {situacao['pendentes']} gravação(ões) ainda não chegaram na planilha. Último erro: {situacao['erro']}")
+    if situacao["falhas"]:
+        st.error("❌ NÃO GRAVADO na planilha (desistiu após várias tentativas): " + " | ".join(" ".join(str(v) for v in l) for l in situacao["falhas"]))
+        if st.button("OK, vou registrar de novo", key="dispensar_falhas_fila"): worksheet.dispensar_falhas(); st.rerun()
+
 # =============================================================================
 # --- 3. LÓGICA DO ROBÔ ---
 # =============================================================================
@@ -178,72 +318,154 @@ def verificar_atualizacao_site(url):
         return False, "🔴 OFF", "Erro site."
     except: return False, "🔴 ERRO", "Falha conexão."
 
+def horarios_do_dia(config_banca, dia_semana):
+    lista_horarios_str = config_banca['horarios']['dom'] if dia_semana == 6 else config_banca['horarios']['segsab']
+    return [h.strip() for h in lista_horarios_str.split('🔹')]
+
+def ttl_status_site(config_banca, agora):
+    minutos = agora.hour * 60 + agora.minute
+    for h in horarios_do_dia(config_banca, agora.weekday()):
+        hh, mm = h.split(':')
+        if 0 <= minutos - (int(hh) * 60 + int(mm)) <= 30: return SONDA_TTL_POS_SORTEIO
+    return SONDA_TTL_PADRAO
+
+def rodar_sonda_sites(estado):
+    # Thread de fundo: só faz rede, nunca chama st.* (roda fora do script)
+    fuso_br = pytz.timezone('America/Sao_Paulo')
+    # Cada banca é protegida: um erro inesperado vira status de erro e a thread segue viva
+    # (o cache_resource nunca recria a sonda, então ela não pode morrer)
+    while True:
+        agora = datetime.now(fuso_br)
+        for config in CONFIG_BANCAS.values():
+            url = config['url_site']
+            try:
+                with estado["lock"]: registro = estado["status"].get(url)
+                if registro and time.time() - registro[1] < ttl_status_site(config, agora): continue
+                resultado = verificar_atualizacao_site(url)
+            except Exception as e: resultado = (False, "🔴 ERRO", f"Sonda: {e}")
+            with estado["lock"]: estado["status"][url] = (resultado, time.time())
+        time.sleep(SONDA_INTERVALO_LOOP)
+
+@st.cache_resource(show_spinner=False)
+def sonda_sites():
+    # Uma sonda por processo; o cache guarda {url: ((online, titulo, detalhe), instante)}
+    estado = {"lock": threading.Lock(), "status": {}}
+    threading.Thread(target=rodar_sonda_sites, args=(estado,), daemon=True).start()
+    return estado
+
+def status_site(url):
+    estado = sonda_sites()
+    with estado["lock"]: registro = estado["status"].get(url)
+    if registro: return registro[0]
+    return False, "⏳ VERIFICANDO", "Primeira checagem em andamento."
+
+# --- CACHE DE PÁGINAS DE RESULTADO (GET CONDICIONAL) ---
+# {(url, dia): {"etag": ..., "last_modified": ..., "mapa": {horario: grupo do 1º prêmio}}}
+@st.cache_resource(show_spinner=False)
+def cache_paginas():
+    return {"lock": threading.Lock(), "paginas": {}}
+
+def extrair_mapa_premios(html):
+    # Parse único da página: cada tabela de prêmios vira uma entrada {horario: grupo}
+    soup = BeautifulSoup(html, 'html.parser')
+    padrao_hora = re.compile(r'\d{2}:\d{2}')
+    mapa = {}
+    for tabela in soup.find_all('table'):
+        texto = tabela.get_text()
+        # Verifica se é uma tabela de premios
+        if "1º" not in texto and "Pri" not in texto: continue
+        
+        # Tenta achar o horario ANTES da tabela
+        horario_encontrado = None
+        prev = tabela.find_previous(string=padrao_hora)
+        if prev:
+            m = re.search(r'(\d{2}:\d{2})', prev)
+            if m: horario_encontrado = m.group(1)
+        if not horario_encontrado or horario_encontrado in mapa: continue
+        
+        grupo = None
+        for linha in tabela.find_all('tr'):
+            colunas = linha.find_all('td')
+            if len(colunas) >= 3:
+                premio = colunas[0].get_text().strip()
+                
+                # IGNORA 10º PREMIO (Correção LOTEP)
+                if "10" in premio: 
+                    continue
+                
+                # Pega o 1º Premio
+                if any(x in premio for x in ['1º', '1', 'Pri']):
+                    grp = colunas[2].get_text().strip()
+                    if grp.isdigit(): grupo = int(grp)
+                    break # Parar de ler linhas se achou o 1º
+        mapa[horario_encontrado] = grupo
+    return mapa
+
 # --- NOVA FUNÇÃO: BUSCAR POR HORÁRIO ESPECÍFICO (CORRIGIDA LOTEP) ---
 def raspar_resultado_por_horario(url, horario_alvo):
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        r = requests.get(url, headers=headers, timeout=5)
-        if r.status_code != 200: return None, "Erro Site"
+        dia = datetime.now(pytz.timezone('America/Sao_Paulo')).strftime("%Y-%m-%d")
+        memoria = cache_paginas()
+        with memoria["lock"]: pagina = memoria["paginas"].get((url, dia))
         
-        soup = BeautifulSoup(r.text, 'html.parser')
-        tabelas = soup.find_all('table')
+        # Resultado já publicado não muda: só vai à rede se o horário ainda não estava na página
+        if not pagina or pagina["mapa"].get(horario_alvo) is None:
+            headers = {'User-Agent': 'Mozilla/5.0'}
+            if pagina and pagina["etag"]: headers['If-None-Match'] = pagina["etag"]
+            if pagina and pagina["last_modified"]: headers['If-Modified-Since'] = pagina["last_modified"]
+            r = requests.get(url, headers=headers, timeout=5)
+            if r.status_code == 304 and pagina: pass
+            elif r.status_code != 200: return None, "Erro Site"
+            else:
+                pagina = {"etag": r.headers.get('ETag'), "last_modified": r.headers.get('Last-Modified'), "mapa": extrair_mapa_premios(r.text)}
+                with memoria["lock"]:
+                    memoria["paginas"] = {k: v for k, v in memoria["paginas"].items() if k[1] == dia}
+                    memoria["paginas"][(url, dia)] = pagina
         
-        for tabela in tabelas:
-            # Verifica se é uma tabela de premios
-            if "1º" in tabela.get_text() or "Pri" in tabela.get_text():
-                horario_encontrado = None
-                
-                # Tenta achar o horario ANTES da tabela
-                prev = tabela.find_previous(string=re.compile(r'\d{2}:\d{2}'))
-                if prev: 
-                    m = re.search(r'(\d{2}:\d{2})', prev)
-                    if m: horario_encontrado = m.group(1)
-                
-                # Se achou horario e é o que queremos
-                if horario_encontrado == horario_alvo:
-                    linhas = tabela.find_all('tr')
-                    for linha in linhas:
-                        colunas = linha.find_all('td')
-                        if len(colunas) >= 3:
-                            premio = colunas[0].get_text().strip()
-                            
-                            # IGNORA 10º PREMIO (Correção LOTEP)
-                            if "10" in premio: 
-                                continue
-                            
-                            # Pega o 1º Premio
-                            if any(x in premio for x in ['1º', '1', 'Pri']):
-                                grp = colunas[2].get_text().strip()
-                                if grp.isdigit():
-                                    return int(grp), "Sucesso"
-                                break # Parar de ler linhas se achou o 1º
-                    
-                    # Se leu a tabela do horario e não achou, retorna
-                    return None, "Horário achado, prêmio não"
-                    
-        return None, "Horário ainda não saiu"
+        if horario_alvo not in pagina["mapa"]: return None, "Horário ainda não saiu"
+        grp = pagina["mapa"][horario_alvo]
+        if grp is None: return None, "Horário achado, prêmio não"
+        return grp, "Sucesso"
         
     except Exception as e: return None, f"Erro: {e}"
 
-def calcular_ranking_forca_completo(historico):
-    if not historico: return []
-    hist_reverso = historico[::-1]
-    scores = {g: 0 for g in range(1, 26)}
-    c_curto = Counter(hist_reverso[:10])
-    for g, f in c_curto.items(): scores[g] += (f * 2.0)
-    c_medio = Counter(hist_reverso[:50])
-    for g, f in c_medio.items(): scores[g] += (f * 1.0)
+def ranking_forca_por_contadores(c_curto, c_medio):
+    scores = {g: c_curto[g] * 2.0 + c_medio[g] * 1.0 for g in range(1, 26)}
     rank = sorted(scores.items(), key=lambda x: -x[1])
     return [g for g, s in rank]
 
-def calcular_ranking_atraso_completo(historico):
+def calcular_ranking_forca_completo(historico):
+    if not historico: return []
+    return ranking_forca_por_contadores(Counter(historico[-10:]), Counter(historico[-50:]))
+
+# --- ÍNDICE DE ÚLTIMA APARIÇÃO (grupo -> posição; -1 = nunca saiu) ---
+def indexar_ultima_posicao(historico, fim=None):
+    # Uma passada de trás pra frente (em historico[:fim]) que para assim que os 25 grupos aparecem
+    ultima_pos = [-1] * 26
+    faltam = 25
+    for i in range((len(historico) if fim is None else fim) - 1, -1, -1):
+        g = historico[i]
+        if ultima_pos[g] < 0:
+            ultima_pos[g] = i; faltam -= 1
+            if faltam == 0: break
+    return ultima_pos
+
+def registrar_no_indice(ultima_pos, posicao, grupo):
+    # Atualização incremental quando um sorteio é anexado ao histórico
+    ultima_pos[grupo] = posicao
+    return ultima_pos
+
+def atrasos_pelo_indice(ultima_pos, total):
+    return {g: (total - 1 - ultima_pos[g]) if ultima_pos[g] >= 0 else total for g in range(1, 26)}
+
+def atraso_grupos_pelo_indice(ultima_pos, total, grupos):
+    ultima = max(ultima_pos[g] for g in grupos)
+    return (total - 1 - ultima) if ultima >= 0 else total
+
+def calcular_ranking_atraso_completo(historico, ultima_pos=None):
     if not historico: return []
-    atrasos = {}
-    total = len(historico)
-    for b in range(1, 26):
-        indices = [i for i, x in enumerate(historico) if x == b]
-        val = total - 1 - indices[-1] if indices else total
-        atrasos[b] = val
+    if ultima_pos is None: ultima_pos = indexar_ultima_posicao(historico)
+    atrasos = atrasos_pelo_indice(ultima_pos, len(historico))
     rank = sorted(atrasos.items(), key=lambda x: -x[1])
     return [g for g, s in rank]
 
@@ -251,109 +473,135 @@ def gerar_palpite_estrategico(historico):
     todos_forca = calcular_ranking_forca_completo(historico)
     return todos_forca[:12]
 
-# --- LÓGICA DE CICLOS ---
-def analisar_ciclo_atual(historico):
-    if not historico: return [], 0, [], 0
-    ciclos_fechados = []
-    conjunto_atual = set()
-    inicio_ciclo = 0
-    
-    for i, bicho in enumerate(historico):
-        conjunto_atual.add(bicho)
-        if len(conjunto_atual) == 25:
-            duracao = i - inicio_ciclo + 1
-            ciclos_fechados.append(duracao)
-            conjunto_atual = set()
-            inicio_ciclo = i + 1
-            
-    # Estado atual
-    faltam_sair = list(set(range(1, 26)) - conjunto_atual)
-    faltam_sair.sort()
-    duracao_atual = len(historico) - inicio_ciclo
-    
-    return faltam_sair, duracao_atual, ciclos_fechados, len(conjunto_atual)
-
-def gerar_backtest_e_status(historico):
-    if len(historico) < 30: return pd.DataFrame(), 0, 0, 0, 0
-    resultados = []
-    
-    # AJUSTE: Mostrar os últimos 25 jogos na tabela
-    inicio = max(0, len(historico) - 25)
-    
+def calcular_recordes(acertos):
     max_loss = 0; temp_loss = 0; max_win = 0; temp_win = 0
-    inicio_risk = max(0, len(historico) - 50)
-    for i in range(inicio_risk, len(historico)):
-        saiu = historico[i]
-        passado = historico[:i]
-        p_princ = gerar_palpite_estrategico(passado)
-        if saiu not in p_princ:
+    for acertou in acertos:
+        if not acertou:
             temp_loss += 1; temp_win = 0
         else:
             temp_win += 1; temp_loss = 0
         if temp_loss > max_loss: max_loss = temp_loss
         if temp_win > max_win: max_win = temp_win
-    
-    for i in range(inicio, len(historico)):
-        saiu = historico[i]
-        passado = historico[:i]
-        p_princ = gerar_palpite_estrategico(passado)
-        status = "❌"
-        if saiu in p_princ: status = "💚"
-        resultados.append({"JOGO": f"#{len(historico)-i}", "SAIU": f"{saiu:02}", "TOP 12": status})
-    
+    return max_loss, max_win
+
+def calcular_sequencia_atual(acertos):
     curr_streak = 0; curr_win_streak = 0
-    for res in reversed(resultados):
-        if res["TOP 12"] == "❌": curr_streak += 1
+    for acertou in reversed(acertos):
+        if not acertou: curr_streak += 1
         else: break
-    for res in reversed(resultados):
-        if res["TOP 12"] == "💚": curr_win_streak += 1
+    for acertou in reversed(acertos):
+        if acertou: curr_win_streak += 1
         else: break
-    return pd.DataFrame(resultados[::-1]), curr_streak, max_loss, max_win, curr_win_streak
+    return curr_streak, curr_win_streak
 
-def analisar_setores_bma_com_maximo(historico):
-    if not historico: return {}, {}, [], []
-    setor_b = list(range(1, 9))
-    setor_m = list(range(9, 17))
-    setor_a = list(range(17, 25))
-    setor_25 = [25]
-    def calcular_atrasos(lista_alvo, hist):
-        atraso_atual = 0; max_atraso = 0; contador_temp = 0
-        for x in reversed(hist):
-            if x in lista_alvo: break
-            atraso_atual += 1
-        for x in hist:
-            if x not in lista_alvo: contador_temp += 1
-            else:
-                if contador_temp > max_atraso: max_atraso = contador_temp
-                contador_temp = 0
-        if contador_temp > max_atraso: max_atraso = contador_temp
-        return atraso_atual, max_atraso
-    def calcular_max_sequencia(lista_alvo, hist):
-        max_seq = 0; curr_seq = 0
-        for x in hist:
-            if x in lista_alvo: curr_seq += 1
-            else:
-                if curr_seq > max_seq: max_seq = curr_seq
-                curr_seq = 0
-        if curr_seq > max_seq: max_seq = curr_seq
-        return max_seq
-    
-    curr_b, max_b_loss = calcular_atrasos(setor_b, historico)
-    curr_m, max_m_loss = calcular_atrasos(setor_m, historico)
-    curr_a, max_a_loss = calcular_atrasos(setor_a, historico)
-    curr_25, max_25_loss = calcular_atrasos(setor_25, historico)
+# --- LÓGICA DE CICLOS (RASTREADOR INCREMENTAL) ---
+def novo_estado_ciclo():
+    return {"fechados": [], "histograma": Counter(), "mascara": 0, "inicio": 0, "processados": 0, "ultimo": None}
+
+# Estado por banca fica no processo; cada refresh só anda sobre os sorteios novos
+@st.cache_resource(show_spinner=False)
+def memoria_ciclos():
+    return {"lock": threading.Lock(), "bancas": {}}
+
+def avancar_ciclo(estado, historico):
+    processados = estado["processados"]
+    if processados > len(historico) or (processados and historico[processados - 1] != estado["ultimo"]):
+        # Histórico encolheu (apagar último) ou mudou por fora: refaz do zero
+        estado.update(novo_estado_ciclo()); processados = 0
+    mascara = estado["mascara"]; inicio = estado["inicio"]
+    for i in range(processados, len(historico)):
+        mascara |= 1 << (historico[i] - 1)
+        if mascara == MASCARA_CICLO_COMPLETO:
+            duracao = i - inicio + 1
+            estado["fechados"].append(duracao); estado["histograma"][duracao] += 1
+            mascara = 0; inicio = i + 1
+    estado.update({"mascara": mascara, "inicio": inicio, "processados": len(historico), "ultimo": historico[-1] if historico else None})
+    return estado
+
+def analisar_ciclo_atual(historico, estado=None):
+    if not historico: return [], 0, [], 0
+    if estado is None: estado = novo_estado_ciclo()
+    avancar_ciclo(estado, historico)
+    mascara = estado["mascara"]
     
-    max_b_win = calcular_max_sequencia(setor_b, historico)
-    max_m_win = calcular_max_sequencia(setor_m, historico)
-    max_a_win = calcular_max_sequencia(setor_a, historico)
-    max_25_win = calcular_max_sequencia(setor_25, historico)
+    # Estado atual
+    faltam_sair = [g for g in range(1, 26) if not (mascara >> (g - 1)) & 1]
+    duracao_atual = len(historico) - estado["inicio"]
     
-    df_setores = pd.DataFrame([
-        {"SETOR": "BAIXO (01-08)", "ATRASO": curr_b, "REC. ATRASO": max_b_loss, "REC. SEQ. (V)": max_b_win},
-        {"SETOR": "MÉDIO (09-16)", "ATRASO": curr_m, "REC. ATRASO": max_m_loss, "REC. SEQ. (V)": max_m_win},
-        {"SETOR": "ALTO (17-24)", "ATRASO": curr_a, "REC. ATRASO": max_a_loss, "REC. SEQ. (V)": max_a_win},
-        {"SETOR": "VACA (25)", "ATRASO": curr_25, "REC. ATRASO": max_25_loss, "REC. SEQ. (V)": max_25_win}
-    ])
+    return faltam_sair, duracao_atual, list(estado["fechados"]), 25 - len(faltam_sair)
+
+def analisar_ciclo_banca(banca, historico):
+    memoria = memoria_ciclos()
+    with memoria["lock"]:
+        estado = memoria["bancas"].setdefault(banca, novo_estado_ciclo())
+        return analisar_ciclo_atual(historico, estado), calcular_estatisticas_ciclo(estado["histograma"])
+
+def calcular_estatisticas_ciclo(histograma, percentis=PERCENTIS_CICLO):
+    # Percentil por posição mais próxima, lido direto do histograma (custo = durações distintas)
+    total = sum(histograma.values())
+    if not total: return {}, pd.DataFrame()
+    itens = sorted(histograma.items())
+    resultado = {}
+    for p in percentis:
+        posicao = max(1, math.ceil(p / 100 * total)); acumulado = 0
+        for duracao, qtd in itens:
+            acumulado += qtd
+            if acumulado >= posicao: resultado[p] = duracao; break
+    df_histograma = pd.DataFrame(itens, columns=["DURAÇÃO", "CICLOS"]).set_index("DURAÇÃO")
+    return resultado, df_histograma
+
+def gerar_backtest_e_status(historico, janela_risco=50, caminhada=None):
+    # janela_risco=None mede os recordes no histórico inteiro (mesma passada única)
+    if len(historico) < 30: return pd.DataFrame(), 0, 0, 0, 0
+    if caminhada is None: caminhada = caminhar_estrategias(historico, inicio_caminhada(historico, janela_risco), ["TOP 12"])
+    return montar_backtest(historico, caminhada, "TOP 12", janela_risco)
+
+# --- MOTOR DE SETORES (NUMPY + RUN-LENGTH) ---
+def mapear_codigos_setor(historico, particao=SETORES_BMA):
+    # Tabela grupo -> código do setor (ordem da partição); -1 = grupo fora da partição
+    tabela = np.full(26, -1, dtype=np.int16)
+    for codigo, grupos in enumerate(particao.values()):
+        grupos = list(grupos)
+        if (tabela[grupos] >= 0).any(): raise ValueError("Partição inválida: grupo repetido em dois setores.")
+        tabela[grupos] = codigo
+    return tabela[np.asarray(historico, dtype=np.int64)]
+
+def calcular_stress_setores(historico, particao=SETORES_BMA):
+    # Uma única codificação run-length do histórico dá, para todos os setores de uma vez,
+    # o atraso atual, o recorde de atraso e o recorde de sequência de vitórias.
+    total = len(historico); qtd = len(particao)
+    atraso = np.full(qtd, total, dtype=np.int64)
+    rec_atraso = np.full(qtd, total, dtype=np.int64)
+    rec_seq = np.zeros(qtd, dtype=np.int64)
+    if total:
+        codigos = mapear_codigos_setor(historico, particao)
+        inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+        comprimentos = np.diff(np.r_[inicios, total])
+        valores = codigos[inicios]
+        validos = valores >= 0
+        inicios, comprimentos, valores = inicios[validos], comprimentos[validos], valores[validos]
+        if len(valores):
+            np.maximum.at(rec_seq, valores, comprimentos)
+            # Blocos agrupados por setor em ordem cronológica: o buraco antes de cada bloco é o atraso que ele encerrou
+            ordem = np.lexsort((inicios, valores))
+            valores, inicios, fins = valores[ordem], inicios[ordem], inicios[ordem] + comprimentos[ordem]
+            novo_setor = np.r_[True, valores[1:] != valores[:-1]]
+            fim_anterior = np.where(novo_setor, 0, np.r_[0, fins[:-1]])
+            ultimo_do_setor = np.r_[novo_setor[1:], True]
+            atraso[valores[ultimo_do_setor]] = total - fins[ultimo_do_setor]
+            rec_atraso[valores[ultimo_do_setor]] = 0
+            np.maximum.at(rec_atraso, valores, inicios - fim_anterior)
+            np.maximum.at(rec_atraso, valores[ultimo_do_setor], total - fins[ultimo_do_setor])
+    return pd.DataFrame({
+        "SETOR": list(particao.keys()),
+        "ATRASO": atraso,
+        "REC. ATRASO": rec_atraso,
+        "REC. SEQ. (V)": rec_seq
+    })
+
+def analisar_setores_bma_com_maximo(historico, particao=SETORES_BMA):
+    if not historico: return {}, {}, [], []
+    df_setores = calcular_stress_setores(historico, particao)
     
     sequencia_visual = []
     for x in historico[::-1][:12]:
@@ -364,38 +612,14 @@ def analisar_setores_bma_com_maximo(historico):
         sequencia_visual.append((sigla, classe))
     return df_setores, sequencia_visual
 
-def analisar_dna_fixo_historico(historico):
+def analisar_dna_fixo_historico(historico, caminhada=None):
     if len(historico) < 50: return [], pd.DataFrame(), 0, 0, 0, 0
-    contagem_total = Counter(historico)
-    top_12_fixo = [g for g, freq in contagem_total.most_common(12)]
-    max_loss = 0; temp_loss = 0; max_win = 0; temp_win = 0
-    inicio_risk = max(0, len(historico) - 50)
-    for i in range(inicio_risk, len(historico)):
-        if historico[i] not in top_12_fixo: 
-            temp_loss += 1; temp_win = 0
-        else:
-            temp_win += 1; temp_loss = 0
-        if temp_loss > max_loss: max_loss = temp_loss
-        if temp_win > max_win: max_win = temp_win
-    
-    resultados_simulacao = []
+    if caminhada is None: caminhada = caminhar_estrategias(historico, inicio_caminhada(historico), ["BUNKER 12"])
     # AJUSTE: Mostrar 25 jogos na tabela Bunker
-    for i, saiu in enumerate(historico[-25:]):
-        status = "❌"
-        if saiu in top_12_fixo: status = "💚"
-        resultados_simulacao.insert(0, {"JOGO": f"Ult-{25-i}", "SAIU": f"{saiu:02}", "BUNKER 12": status})
-        
-    curr_streak = 0; curr_win_streak = 0
-    for res in resultados_simulacao: 
-        if res["BUNKER 12"] == "❌": curr_streak += 1
-        else: break
-    for res in resultados_simulacao:
-        if res["BUNKER 12"] == "💚": curr_win_streak += 1
-        else: break
-    return top_12_fixo, pd.DataFrame(resultados_simulacao), max_loss, curr_streak, max_win, curr_win_streak
+    df_bunker, curr_streak, max_loss, max_win, curr_win_streak = montar_backtest(historico, caminhada, "BUNKER 12", prefixo="Ult-")
+    return caminhada[1]["BUNKER 12"], df_bunker, max_loss, curr_streak, max_win, curr_win_streak
 
-def gerar_palpite_setorizado(historico):
-    ranking = calcular_ranking_forca_completo(historico)
+def palpite_setorizado_do_ranking(ranking):
     setor_b = [g for g in ranking if 1 <= g <= 8]
     setor_m = [g for g in ranking if 9 <= g <= 16]
     setor_a = [g for g in ranking if 17 <= g <= 25] 
@@ -404,108 +628,138 @@ def gerar_palpite_setorizado(historico):
     palpite.sort()
     return palpite
 
-def gerar_backtest_setorizado(historico):
+def gerar_palpite_setorizado(historico):
+    return palpite_setorizado_do_ranking(calcular_ranking_forca_completo(historico))
+
+def gerar_backtest_setorizado(historico, caminhada=None):
     if len(historico) < 30: return pd.DataFrame(), [], 0, 0, 0, 0
-    resultados = []
+    if caminhada is None: caminhada = caminhar_estrategias(historico, inicio_caminhada(historico), ["SETORIZADA"])
     # AJUSTE: Mostrar 25 jogos na tabela Setorizada
-    inicio = max(0, len(historico) - 25)
-    
-    lista_atual = gerar_palpite_setorizado(historico)
-    max_derrotas = 0; temp_derrotas = 0; max_win = 0; temp_win = 0
-    inicio_risk = max(0, len(historico) - 50)
-    for i in range(inicio_risk, len(historico)):
-        saiu = historico[i]
-        passado = historico[:i]
-        pulp = gerar_palpite_setorizado(passado)
-        if saiu not in pulp:
-            temp_derrotas += 1; temp_win = 0
-        else:
-            temp_win += 1; temp_derrotas = 0
-        if temp_derrotas > max_derrotas: max_derrotas = temp_derrotas
-        if temp_win > max_win: max_win = temp_win
-        
-    for i in range(inicio, len(historico)):
-        saiu = historico[i]
-        passado = historico[:i]
-        palpite_da_epoca = gerar_palpite_setorizado(passado)
-        status = "❌"
-        if saiu in palpite_da_epoca: status = "💚"
-        resultados.append({"JOGO": f"#{len(historico)-i}", "SAIU": f"{saiu:02}", "RES (4x4x4)": status})
-        
-    curr_streak = 0; curr_win_streak = 0
-    for res in reversed(resultados):
-        if res["RES (4x4x4)"] == "❌": curr_streak += 1
-        else: break
-    for res in reversed(resultados):
-        if res["RES (4x4x4)"] == "💚": curr_win_streak += 1
-        else: break
-    return pd.DataFrame(resultados[::-1]), lista_atual, max_derrotas, curr_streak, max_win, curr_win_streak
+    df_setor, curr_streak, max_derrotas, max_win, curr_win_streak = montar_backtest(historico, caminhada, "SETORIZADA")
+    return df_setor, caminhada[1]["SETORIZADA"], max_derrotas, curr_streak, max_win, curr_win_streak
 
-def identificar_bma_crise_tendencia(historico):
-    if not historico: return [], "", ""
-    mapa_setores = {"BAIXO": list(range(1, 9)), "MÉDIO": list(range(9, 17)), "ALTO": list(range(17, 25))}
-    atrasos = {"BAIXO": 0, "MÉDIO": 0, "ALTO": 0}
-    for nome, nums in mapa_setores.items():
-        cnt = 0
-        for x in reversed(historico):
-            if x in nums: break
-            cnt += 1
-        atrasos[nome] = cnt
+def posicoes_do_ranking(ranking):
+    # grupo -> posição no ranking de força (lista de 26; 99 = fora do ranking)
+    posicao = [99] * 26
+    for p, g in enumerate(ranking): posicao[g] = p
+    return posicao
+
+def bma_por_indices(ultima_pos, total, c_curto, posicao):
+    # Atraso dos setores pelo índice de última aparição, tendência pelo contador dos
+    # últimos 10 jogos e ordenação dos candidatos pela posição no ranking: nada relê o histórico
+    atrasos = {nome: atraso_grupos_pelo_indice(ultima_pos, total, grupos) for nome, grupos in SETORES_BMA_CT.items()}
     setor_crise = max(atrasos, key=atrasos.get)
-    recorte = historico[-10:]
-    freqs = {"BAIXO": 0, "MÉDIO": 0, "ALTO": 0}
-    for x in recorte:
-        if 1 <= x <= 8: freqs["BAIXO"] += 1
-        elif 9 <= x <= 16: freqs["MÉDIO"] += 1
-        elif 17 <= x <= 24: freqs["ALTO"] += 1
+    freqs = {nome: sum(c_curto[g] for g in grupos) for nome, grupos in SETORES_BMA_CT.items()}
     setor_tendencia = max(freqs, key=freqs.get)
     
-    ranking_geral = calcular_ranking_forca_completo(historico)
     def filtrar_top6(setor_nome):
-        candidatos = mapa_setores[setor_nome]
-        candidatos_ordenados = sorted(candidatos, key=lambda x: ranking_geral.index(x) if x in ranking_geral else 99)
-        return candidatos_ordenados[:6]
+        return sorted(SETORES_BMA_CT[setor_nome], key=lambda g: posicao[g])[:6]
     top6_crise = filtrar_top6(setor_crise)
     top6_tendencia = filtrar_top6(setor_tendencia)
     palpite = list(set(top6_crise + top6_tendencia))
     palpite.sort()
     return palpite, setor_crise, setor_tendencia
 
-def gerar_backtest_bma(historico):
-    resultados = []
+def identificar_bma_crise_tendencia(historico):
+    if not historico: return [], "", ""
+    ranking_geral = calcular_ranking_forca_completo(historico)
+    return bma_por_indices(indexar_ultima_posicao(historico), len(historico), Counter(historico[-10:]), posicoes_do_ranking(ranking_geral))
+
+def gerar_backtest_bma(historico, caminhada=None):
     palpite_atual, crise, trend = identificar_bma_crise_tendencia(historico)
-    max_loss = 0; temp_loss = 0; max_win = 0; temp_win = 0
-    inicio_risk = max(0, len(historico) - 50)
-    for i in range(inicio_risk, len(historico)):
-        saiu = historico[i]
-        passado = historico[:i]
-        pulp, _, _ = identificar_bma_crise_tendencia(passado)
-        if saiu not in pulp:
-            temp_loss += 1; temp_win = 0
-        else:
-            temp_win += 1; temp_loss = 0
-        if temp_loss > max_loss: max_loss = temp_loss
-        if temp_win > max_win: max_win = temp_win
-        
+    if caminhada is None: caminhada = caminhar_estrategias(historico, inicio_caminhada(historico), ["BMA"])
     # AJUSTE: Mostrar 25 jogos na tabela BMA
-    inicio = max(0, len(historico) - 25)
-    
+    df_bma, curr_streak, max_loss, max_win, curr_win_streak = montar_backtest(historico, caminhada, "BMA")
+    return df_bma, palpite_atual, crise, trend, max_loss, curr_streak, max_win, curr_win_streak
+
+# --- REGISTRO DE ESTRATÉGIAS (CAMINHADA ÚNICA) ---
+# Estado compartilhado do passo i: tudo nele reflete historico[:i] e é atualizado uma
+# vez por passo para todas as estratégias (contadores de 10/50 jogos, índice de última
+# aparição, ranking de força e posições calculados sob demanda e memo para valores fixos da caminhada).
+def novo_estado_caminhada(historico, inicio):
+    return {
+        "historico": historico,
+        "i": inicio,
+        "c_curto": Counter(historico[max(0, inicio - 10):inicio]),
+        "c_medio": Counter(historico[max(0, inicio - 50):inicio]),
+        "ultima_pos": indexar_ultima_posicao(historico, inicio),
+        "ranking": None,
+        "posicao": None,
+        "memo": {}
+    }
+
+def avancar_estado(estado):
+    historico = estado["historico"]; i = estado["i"]; saiu = historico[i]
+    estado["c_curto"][saiu] += 1; estado["c_medio"][saiu] += 1
+    if i >= 10: estado["c_curto"][historico[i - 10]] -= 1
+    if i >= 50: estado["c_medio"][historico[i - 50]] -= 1
+    registrar_no_indice(estado["ultima_pos"], i, saiu)
+    estado["i"] = i + 1; estado["ranking"] = None; estado["posicao"] = None
+
+def ranking_do_estado(estado):
+    if estado["ranking"] is None:
+        estado["ranking"] = ranking_forca_por_contadores(estado["c_curto"], estado["c_medio"]) if estado["i"] > 0 else []
+    return estado["ranking"]
+
+def posicao_do_estado(estado):
+    if estado["posicao"] is None: estado["posicao"] = posicoes_do_ranking(ranking_do_estado(estado))
+    return estado["posicao"]
+
+def palpite_top12_estado(estado):
+    return ranking_do_estado(estado)[:12]
+
+def palpite_bunker_estado(estado):
+    # Bunker é fixo: frequência do histórico inteiro, igual em todos os passos
+    if "bunker" not in estado["memo"]:
+        estado["memo"]["bunker"] = [g for g, freq in Counter(estado["historico"]).most_common(12)]
+    return estado["memo"]["bunker"]
+
+def palpite_setorizado_estado(estado):
+    return palpite_setorizado_do_ranking(ranking_do_estado(estado))
+
+def palpite_bma_estado(estado):
+    if estado["i"] == 0: return []
+    palpite, _, _ = bma_por_indices(estado["ultima_pos"], estado["i"], estado["c_curto"], posicao_do_estado(estado))
+    return palpite
+
+# Nova estratégia = nova entrada aqui (uma chamada barata a mais por passo)
+ESTRATEGIAS = {
+    "TOP 12": {"coluna": "TOP 12", "palpite": palpite_top12_estado},
+    "BUNKER 12": {"coluna": "BUNKER 12", "palpite": palpite_bunker_estado},
+    "SETORIZADA": {"coluna": "RES (4x4x4)", "palpite": palpite_setorizado_estado},
+    "BMA": {"coluna": "BMA (C+T)", "palpite": palpite_bma_estado},
+}
+
+def inicio_caminhada(historico, janela_risco=50):
+    # Cobre a janela de risco e a tabela dos últimos 25 jogos
+    if janela_risco is None: return 0
+    return max(0, len(historico) - max(janela_risco, 25))
+
+def caminhar_estrategias(historico, inicio=0, nomes=None):
+    # Uma passada de inicio até o fim avaliando todas as estratégias pedidas.
+    # Devolve ({nome: [acertou, ...]}, {nome: palpite atual com o histórico todo}, inicio)
+    nomes = list(nomes or ESTRATEGIAS.keys())
+    inicio = max(0, inicio)
+    estado = novo_estado_caminhada(historico, inicio)
+    acertos = {nome: [] for nome in nomes}
     for i in range(inicio, len(historico)):
         saiu = historico[i]
-        passado = historico[:i]
-        palpite_epoca, _, _ = identificar_bma_crise_tendencia(passado)
-        status = "❌"
-        if saiu in palpite_epoca: status = "💚"
-        resultados.append({"JOGO": f"#{len(historico)-i}", "SAIU": f"{saiu:02}", "BMA (C+T)": status})
-        
-    curr_streak = 0; curr_win_streak = 0
-    for res in reversed(resultados):
-        if res["BMA (C+T)"] == "❌": curr_streak += 1
-        else: break
-    for res in reversed(resultados):
-        if res["BMA (C+T)"] == "💚": curr_win_streak += 1
-        else: break
-    return pd.DataFrame(resultados[::-1]), palpite_atual, crise, trend, max_loss, curr_streak, max_win, curr_win_streak
+        for nome in nomes: acertos[nome].append(saiu in ESTRATEGIAS[nome]["palpite"](estado))
+        avancar_estado(estado)
+    atuais = {nome: ESTRATEGIAS[nome]["palpite"](estado) for nome in nomes}
+    return acertos, atuais, inicio
+
+def montar_backtest(historico, caminhada, nome, janela_risco=50, prefixo="#"):
+    # Tabela dos últimos 25 jogos + recordes na janela de risco, a partir da caminhada
+    acertos_por_nome, _, inicio = caminhada
+    acertos = acertos_por_nome[nome]; coluna = ESTRATEGIAS[nome]["coluna"]
+    total = len(historico)
+    inicio_tabela = max(0, total - 25)
+    inicio_risk = 0 if janela_risco is None else max(0, total - janela_risco)
+    resultados = [{"JOGO": f"{prefixo}{total-i}", "SAIU": f"{historico[i]:02}", coluna: "💚" if acertos[i - inicio] else "❌"} for i in range(inicio_tabela, total)]
+    max_loss, max_win = calcular_recordes(acertos[inicio_risk - inicio:])
+    curr_streak, curr_win_streak = calcular_sequencia_atual(acertos[inicio_tabela - inicio:])
+    return pd.DataFrame(resultados[::-1]), curr_streak, max_loss, max_win, curr_win_streak
 
 def calcular_inverso(palpite):
     universo = set(range(1, 26))
@@ -514,24 +768,213 @@ def calcular_inverso(palpite):
     inverso.sort()
     return inverso
 
-def monitorar_oportunidades(historico, df_setores):
+# --- CONTEXTO DE ANÁLISE (CADA BACKTEST RODA UMA VEZ POR RENDERIZAÇÃO) ---
+def montar_contexto_analise(historico, banca=None, worksheet=None):
+    # worksheet (opcional) traz o histórico colunar para a análise por horário
+    caminhada = caminhar_estrategias(historico, inicio_caminhada(historico))
+    if banca: ciclo, ciclo_stats = analisar_ciclo_banca(banca, historico)
+    else:
+        ciclo = analisar_ciclo_atual(historico)
+        ciclo_stats = calcular_estatisticas_ciclo(Counter(ciclo[2]))
+    return {
+        "historico": historico,
+        "top12": gerar_backtest_e_status(historico, caminhada=caminhada),
+        "palp_top12": gerar_palpite_estrategico(historico),
+        "setores": analisar_setores_bma_com_maximo(historico),
+        "bunker": analisar_dna_fixo_historico(historico, caminhada),
+        "setorizada": gerar_backtest_setorizado(historico, caminhada),
+        "bma": gerar_backtest_bma(historico, caminhada),
+        "ciclo": ciclo,
+        "ciclo_stats": ciclo_stats,
+        "por_horario": analisar_por_horario(carregar_historico_colunar(worksheet)),
+    }
+
+# --- ANÁLISE POR HORÁRIO (PASSADA AGRUPADA SOBRE O HISTÓRICO COLUNAR) ---
+def separar_por_horario(colunar):
+    # Um argsort estável agrupa os sorteios por horário mantendo a ordem cronológica
+    # dentro de cada grupo: {código do horário: índices no histórico}
+    codigos = colunar["horario"]
+    ordem = np.argsort(codigos, kind="stable")
+    cortes = np.flatnonzero(np.diff(codigos[ordem])) + 1
+    return {int(codigos[bloco[0]]): bloco for bloco in np.split(ordem, cortes) if len(bloco)}
+
+def analisar_por_horario(colunar, particao=SETORES_BMA):
+    # Top 12, atrasos de setor e ciclo de cada horário; cada motor roda só na
+    # subsequência do seu horário, então o trabalho total é uma passada no histórico.
+    if colunar is None or not len(colunar["grupo"]): return {}
+    resultado = {}
+    for codigo, indices in separar_por_horario(colunar).items():
+        if codigo < 0: continue  # Linhas sem horário
+        sub = colunar["grupo"][indices].tolist()
+        faltam, duracao, _, progresso = analisar_ciclo_atual(sub)
+        resultado[colunar["rotulos_horario"][codigo]] = {
+            "jogos": len(sub),
+            "ultimo": sub[-1],
+            "top12": gerar_palpite_estrategico(sub),
+            "setores": calcular_stress_setores(sub, particao),
+            "ciclo": (faltam, duracao, progresso),
+        }
+    return dict(sorted(resultado.items()))
+
+def montar_tabela_horarios(por_horario):
+    linhas = []
+    for horario, r in por_horario.items():
+        df = r["setores"]
+        critico = df.loc[(df["ATRASO"] / df["REC. ATRASO"].clip(lower=1)).idxmax()]
+        faltam, duracao, progresso = r["ciclo"]
+        linhas.append({
+            "HORÁRIO": horario, "JOGOS": r["jogos"], "ÚLTIMO": f"{r['ultimo']:02}",
+            "TOP 12": ", ".join(f"{n:02}" for n in r["top12"]),
+            "CICLO": f"{progresso}/25 em {duracao}J",
+            "SETOR + PRESSIONADO": f"{critico['SETOR']} ({critico['ATRASO']}/{critico['REC. ATRASO']})",
+        })
+    return pd.DataFrame(linhas).set_index("HORÁRIO") if linhas else pd.DataFrame()
+
+# --- MOTOR ENTRE BANCAS (COOCORRÊNCIA E TRANSIÇÃO COM DEFASAGEM) ---
+# Cada banca vira uma linha do tempo (minuto absoluto = dia * 1440 + horário). Matrizes 25x25:
+#   coocorrência (A, B): pares de sorteios de A e B a até TOLERANCIA_SIMULTANEO minutos;
+#   transição (A -> B, L): grupo de A contra o L-ésimo sorteio de B depois dele.
+# Tudo via bincount no índice combinado (grupo_a - 1) * 25 + (grupo_b - 1); a cada carga
+# só os sorteios novos entram (recalcula do zero se alguma banca encolher/mudar).
+TOLERANCIA_SIMULTANEO = 30
+DEFASAGENS_CRUZADAS = (1, 2, 3)
+
+def minutos_do_horario(rotulo):
+    m = re.match(r'\s*(\d{1,2})[:hH](\d{2})', str(rotulo))
+    return int(m.group(1)) * 60 + int(m.group(2)) if m else -1
+
+def linha_do_tempo(colunar):
+    # Sorteios com data e horário válidos -> (minuto absoluto, grupo) em ordem cronológica
+    if colunar is None: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    minutos_rotulo = np.array([minutos_do_horario(r) for r in colunar["rotulos_horario"]] + [-1], dtype=np.int64)
+    minutos = minutos_rotulo[colunar["horario"]]  # Código -1 (sem horário) cai no sentinela -1
+    validos = (minutos >= 0) & ~np.isnat(colunar["data"])
+    tempos = colunar["data"][validos].astype(np.int64) * 1440 + minutos[validos]
+    ordem = np.argsort(tempos, kind="stable")
+    return tempos[ordem], colunar["grupo"][validos][ordem].astype(np.int64)
+
+def pares_proximos(t_a, t_b, tolerancia):
+    # Todos os pares (i, j) com |t_a[i] - t_b[j]| <= tolerancia (t_b ordenado), sem laço em Python
+    inicio = np.searchsorted(t_b, t_a - tolerancia, side="left")
+    fim = np.searchsorted(t_b, t_a + tolerancia, side="right")
+    qtd = fim - inicio
+    i = np.repeat(np.arange(len(t_a)), qtd)
+    j = np.repeat(inicio, qtd) + np.arange(qtd.sum()) - np.repeat(np.cumsum(qtd) - qtd, qtd)
+    return i, j
+
+def contar_pares(g_a, g_b):
+    return np.bincount((g_a - 1) * 25 + (g_b - 1), minlength=625).reshape(25, 25)
+
+def novo_estado_cruzado():
+    return {"vistos": {}, "coocorrencia": {}, "transicao": {}, "pareados": {}}
+
+def avancar_cruzado(estado, linhas):
+    # linhas: {banca: (tempos, grupos)}; acrescenta ao estado só o que chegou desde a última carga
+    for banca, (t, g) in linhas.items():
+        visto = estado["vistos"].get(banca)
+        if visto and (len(t) < visto[0] or (visto[0] and (t[visto[0] - 1], g[visto[0] - 1]) != visto[1:])):
+            estado.clear(); estado.update(novo_estado_cruzado()); break
+    if set(estado["vistos"]) - set(linhas):
+        estado.clear(); estado.update(novo_estado_cruzado())
+    antes = {b: estado["vistos"].get(b, (0,))[0] for b in linhas}
+    bancas = list(linhas)
+    for x, a in enumerate(bancas):
+        t_a, g_a = linhas[a]; n_a = antes[a]
+        for b in bancas[x + 1:]:
+            t_b, g_b = linhas[b]; n_b = antes[b]
+            matriz = estado["coocorrencia"].setdefault((a, b), np.zeros((25, 25), dtype=np.int64))
+            i, j = pares_proximos(t_a[n_a:], t_b, TOLERANCIA_SIMULTANEO)  # Novos de A x todos de B
+            matriz += contar_pares(g_a[n_a:][i], g_b[j])
+            j, i = pares_proximos(t_b[n_b:], t_a[:n_a], TOLERANCIA_SIMULTANEO)  # Novos de B x antigos de A
+            matriz += contar_pares(g_a[:n_a][i], g_b[n_b:][j])
+        for b in bancas:
+            if b == a: continue
+            t_b, g_b = linhas[b]
+            for lag in DEFASAGENS_CRUZADAS:
+                # O sucessor de cada sorteio de A só anda para frente: quem já foi pareado não muda
+                chave = (a, b, lag)
+                feitos = estado["pareados"].get(chave, 0)
+                alvo = np.searchsorted(t_b, t_a[feitos:], side="right") + lag - 1
+                prontos = int((alvo < len(t_b)).sum())
+                matriz = estado["transicao"].setdefault(chave, np.zeros((25, 25), dtype=np.int64))
+                matriz += contar_pares(g_a[feitos:feitos + prontos], g_b[alvo[:prontos]])
+                estado["pareados"][chave] = feitos + prontos
+    for banca, (t, g) in linhas.items():
+        estado["vistos"][banca] = (len(t), t[-1], g[-1]) if len(t) else (0,)
+    return estado
+
+@st.cache_resource(show_spinner=False)
+def memoria_cruzada():
+    return {"lock": threading.Lock(), "estado": novo_estado_cruzado()}
+
+def sinais_entre_bancas(estado, linhas, lag=1, top=5):
+    # Para o último sorteio de cada banca: o que mais saiu depois dele nas outras bancas
+    linhas_tabela = []
+    for a, (t_a, g_a) in linhas.items():
+        if not len(g_a): continue
+        ultimo = int(g_a[-1])
+        for b in linhas:
+            if b == a or (a, b, lag) not in estado["transicao"]: continue
+            contagem = estado["transicao"][(a, b, lag)][ultimo - 1]
+            if not contagem.sum(): continue
+            melhores = np.argsort(-contagem, kind="stable")[:top]
+            linhas_tabela.append({
+                "ORIGEM": f"{CONFIG_BANCAS[a]['display_name']} ({ultimo:02})",
+                "ALVO": CONFIG_BANCAS[b]["display_name"],
+                f"MAIS FREQUENTES (+{lag})": ", ".join(f"{g + 1:02} ({contagem[g]})" for g in melhores),
+                "AMOSTRAS": int(contagem.sum()),
+            })
+    return pd.DataFrame(linhas_tabela)
+
+# --- CACHE DE RESULTADOS (BANCA + DIGEST DO HISTÓRICO) ---
+# Mexer na barra lateral faz rerun com o mesmo histórico: o contexto pronto sai daqui.
+# Salvar/apagar muda o histórico (e o digest) e ainda limpa as entradas da banca.
+MAX_CONTEXTOS_CACHE = 16
+
+@st.cache_resource(show_spinner=False)
+def memoria_contextos():
+    return {"lock": threading.Lock(), "itens": OrderedDict()}
+
+def digest_historico(historico):
+    return hashlib.blake2b(np.asarray(historico, dtype=np.uint8).tobytes(), digest_size=16).hexdigest()
+
+def contexto_em_cache(historico, banca=None, worksheet=None):
+    chave = (banca, digest_historico(historico))
+    memoria = memoria_contextos()
+    with memoria["lock"]:
+        if chave in memoria["itens"]:
+            memoria["itens"].move_to_end(chave)
+            return memoria["itens"][chave]
+    contexto = montar_contexto_analise(historico, banca, worksheet)
+    with memoria["lock"]:
+        memoria["itens"][chave] = contexto
+        while len(memoria["itens"]) > MAX_CONTEXTOS_CACHE: memoria["itens"].popitem(last=False)  # LRU
+    return contexto
+
+def invalidar_contextos(banca):
+    memoria = memoria_contextos()
+    with memoria["lock"]:
+        for chave in [c for c in memoria["itens"] if c[0] == banca]: del memoria["itens"][chave]
+
+def monitorar_oportunidades(contexto):
     alertas = []; tipos = []; sugestoes = []
+    df_setores, _ = contexto["setores"]
     
     # 1. Alertas de Estratégias (Padrão)
-    _, curr_loss_12, max_loss_12, max_win_12, curr_win_12 = gerar_backtest_e_status(historico)
-    palp_12 = gerar_palpite_estrategico(historico)
+    _, curr_loss_12, max_loss_12, max_win_12, curr_win_12 = contexto["top12"]
+    palp_12 = contexto["palp_top12"]
     if curr_loss_12 >= (max_loss_12 - 1) and curr_loss_12 > 0: alertas.append(f"⚡ TOP 12: Derrotas ({curr_loss_12}) perto do Recorde ({max_loss_12})!"); tipos.append("erro"); sugestoes.append(None)
     if curr_win_12 >= (max_win_12 - 1) and curr_win_12 > 0: alertas.append(f"🛑 TOP 12: {curr_win_12} Vitórias. Perto do Recorde ({max_win_12})!"); tipos.append("aviso"); sugestoes.append(calcular_inverso(palp_12))
     
-    palp_bunker, _, max_loss_bun, curr_loss_bun, max_win_bun, curr_win_bun = analisar_dna_fixo_historico(historico)
+    palp_bunker, _, max_loss_bun, curr_loss_bun, max_win_bun, curr_win_bun = contexto["bunker"]
     if curr_loss_bun >= (max_loss_bun - 1) and curr_loss_bun > 0: alertas.append(f"🛡️ BUNKER: Derrotas ({curr_loss_bun}) perto do Recorde ({max_loss_bun})!"); tipos.append("erro"); sugestoes.append(None)
     if curr_win_bun >= (max_win_bun - 1) and curr_win_bun > 0: alertas.append(f"🛑 BUNKER: {curr_win_bun} Vitórias. Perto do Recorde ({max_win_bun})!"); tipos.append("aviso"); sugestoes.append(calcular_inverso(palp_bunker))
     
-    _, palp_bma, _, _, risk_bma, curr_loss_bma, max_win_bma, curr_win_bma = gerar_backtest_bma(historico)
+    _, palp_bma, _, _, risk_bma, curr_loss_bma, max_win_bma, curr_win_bma = contexto["bma"]
     if curr_loss_bma >= (risk_bma - 1) and curr_loss_bma > 0: alertas.append(f"🔥 BMA: Derrotas ({curr_loss_bma}) perto do Recorde ({risk_bma})!"); tipos.append("erro"); sugestoes.append(None)
     if curr_win_bma >= (max_win_bma - 1) and curr_win_bma > 0: alertas.append(f"🛑 BMA: {curr_win_bma} Vitórias. Perto do Recorde ({max_win_bma})!"); tipos.append("aviso"); sugestoes.append(calcular_inverso(palp_bma))
     
-    _, palp_set, risk_set, curr_loss_set, max_win_set, curr_win_set = gerar_backtest_setorizado(historico)
+    _, palp_set, risk_set, curr_loss_set, max_win_set, curr_win_set = contexto["setorizada"]
     if curr_loss_set >= (risk_set - 1) and curr_loss_set > 0: alertas.append(f"⚖️ SETORIZADA: Derrotas ({curr_loss_set}) perto do Recorde ({risk_set})!"); tipos.append("erro"); sugestoes.append(None)
     if curr_win_set >= (max_win_set - 1) and curr_win_set > 0: alertas.append(f"🛑 SETORIZADA: {curr_win_set} Vitórias. Perto do Recorde ({max_win_set})!"); tipos.append("aviso"); sugestoes.append(calcular_inverso(palp_set))
     
@@ -550,6 +993,57 @@ def monitorar_oportunidades(historico, df_setores):
 
     return alertas, tipos, sugestoes
 
+# --- VISÃO GERAL (TODAS AS BANCAS EM PARALELO) ---
+def resumir_estrategias(contexto):
+    # {estratégia: (derrotas atuais, rec. derrotas, vitórias atuais, rec. vitórias)}
+    _, curr_loss_12, max_loss_12, max_win_12, curr_win_12 = contexto["top12"]
+    _, _, max_loss_bun, curr_loss_bun, max_win_bun, curr_win_bun = contexto["bunker"]
+    _, _, risk_set, curr_loss_set, max_win_set, curr_win_set = contexto["setorizada"]
+    _, _, _, _, risk_bma, curr_loss_bma, max_win_bma, curr_win_bma = contexto["bma"]
+    return {
+        "TOP 12": (curr_loss_12, max_loss_12, curr_win_12, max_win_12),
+        "BUNKER": (curr_loss_bun, max_loss_bun, curr_win_bun, max_win_bun),
+        "SETORIZADA": (curr_loss_set, risk_set, curr_win_set, max_win_set),
+        "BMA": (curr_loss_bma, risk_bma, curr_win_bma, max_win_bma)
+    }
+
+def celula_alerta(curr_loss, rec_loss, curr_win, rec_win):
+    # Mesmos gatilhos do Centro de Alertas
+    if curr_loss >= (rec_loss - 1) and curr_loss > 0: return f"🔴 {curr_loss}D (Rec {rec_loss})"
+    if curr_win >= (rec_win - 1) and curr_win > 0: return f"🛑 {curr_win}V (Rec {rec_win})"
+    return f"🟢 {curr_loss}D · {curr_win}V"
+
+def analisar_banca(banca, worksheet):
+    historico, ultimo_horario = carregar_dados(worksheet)
+    if not historico: return banca, None, ultimo_horario
+    return banca, contexto_em_cache(historico, banca, worksheet), ultimo_horario
+
+def analisar_banca_da_planilha(banca):
+    # Abre a aba e analisa dentro da mesma thread: conexão e leitura das bancas se sobrepõem
+    worksheet = conectar_planilha(banca)
+    return analisar_banca(banca, worksheet) if worksheet else None
+
+def carregar_visao_geral():
+    # Leitura das planilhas (I/O) das bancas se sobrepõe num pool de threads
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(max_workers=len(BANCA_OPCOES), initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as pool:
+        futuros = [pool.submit(analisar_banca_da_planilha, banca) for banca in BANCA_OPCOES]
+        return [r for r in (f.result() for f in futuros) if r is not None]
+
+def montar_matriz_alertas(resultados):
+    linhas = []
+    for banca, contexto, ultimo_horario in resultados:
+        linha = {"BANCA": CONFIG_BANCAS[banca]['display_name']}
+        if contexto is None:
+            linha["ÚLTIMO"] = "Planilha vazia"; linhas.append(linha); continue
+        linha["ÚLTIMO"] = f"{contexto['historico'][-1]:02} ({ultimo_horario})"
+        for nome, valores in resumir_estrategias(contexto).items(): linha[nome] = celula_alerta(*valores)
+        df_setores, _ = contexto["setores"]
+        estourados = [row['SETOR'].split(' ')[0] for _, row in df_setores.iterrows() if row['ATRASO'] >= row['REC. ATRASO'] and row['ATRASO'] > 0]
+        linha["SETORES"] = "⚠️ " + ", ".join(estourados) if estourados else "🟢"
+        linhas.append(linha)
+    return pd.DataFrame(linhas).set_index("BANCA")
+
 # =============================================================================
 # --- 6. INTERFACE PRINCIPAL ---
 # =============================================================================
@@ -557,25 +1051,15 @@ def monitorar_oportunidades(historico, df_setores):
 if st.session_state['tocar_som_salvar']: reproduzir_som('sucesso'); st.session_state['tocar_som_salvar'] = False
 if st.session_state['tocar_som_apagar']: reproduzir_som('apagar'); st.session_state['tocar_som_apagar'] = False
 
-with st.sidebar:
-    st.header("🦅 MENU DE JOGO")
-    banca_selecionada = st.selectbox("Selecione a Banca:", BANCA_OPCOES)
-    config_banca = CONFIG_BANCAS[banca_selecionada]
-    
-    fuso_br = pytz.timezone('America/Sao_Paulo')
-    dia_semana = datetime.now(fuso_br).weekday()
-    lista_horarios_str = config_banca['horarios']['dom'] if dia_semana == 6 else config_banca['horarios']['segsab']
-    lista_horarios = [h.strip() for h in lista_horarios_str.split('🔹')]
-    
-    if st.session_state.get('auto_horario_idx', 0) >= len(lista_horarios):
-        st.session_state['auto_horario_idx'] = 0
-    
-    st.markdown("---")
-    
-    c_link, _ = st.columns([1, 0.1])
-    with c_link:
-        st.link_button("🔗 Ver Site Oficial", config_banca['url_site'])
-    
+# --- FRAGMENTOS DA INTERFACE ---
+# O registro (horário, Checar, grupo) reroda só o próprio fragmento: não relê a
+# planilha nem redesenha a análise. Salvar/apagar pedem um rerun completo.
+# A análise se redesenha sozinha de tempos em tempos para pegar linhas gravadas
+# por outro aparelho; com o histórico igual, o contexto sai do cache.
+INTERVALO_ANALISE = 60
+
+@st.fragment
+def painel_registro(banca_selecionada, config_banca, lista_horarios):
     st.write("📝 **Registrar Sorteio**")
     novo_horario = st.selectbox("Horário:", lista_horarios, index=st.session_state.get('auto_horario_idx', 0))
     
@@ -596,6 +1080,7 @@ with st.sidebar:
         if st.button("💾 SALVAR", type="primary"):
             aba = conectar_planilha(banca_selecionada)
             if aba and salvar_na_nuvem(aba, novo_bicho, novo_horario):
+                invalidar_contextos(banca_selecionada)
                 st.session_state['tocar_som_salvar'] = True
                 st.toast("Salvo! 🔔", icon="✅"); time.sleep(0.5); st.rerun()
     with col_btn2:
@@ -605,134 +1090,216 @@ with st.sidebar:
         if st.button("APAGAR ÚLTIMO"):
             aba = conectar_planilha(banca_selecionada)
             if aba and deletar_ultimo_registro(aba):
+                invalidar_contextos(banca_selecionada)
                 st.session_state['tocar_som_apagar'] = True
                 st.toast("Apagado! 🗑️", icon="🗑️"); time.sleep(0.5); st.rerun()
 
-aba_ativa = conectar_planilha(banca_selecionada)
+@st.fragment(run_every=INTERVALO_ANALISE)
+def painel_analise(banca_selecionada):
+    aba_ativa = conectar_planilha(banca_selecionada)
 
-if aba_ativa:
-    historico, ultimo_horario_salvo = carregar_dados(aba_ativa)
+    if aba_ativa:
+        mostrar_situacao_fila(aba_ativa)
+        historico, ultimo_horario_salvo = carregar_dados(aba_ativa)
     
-    if len(historico) > 0:
-        aplicar_estilo_banca(banca_selecionada)
-        config_atual = CONFIG_BANCAS[banca_selecionada]
+        if len(historico) > 0:
+            aplicar_estilo_banca(banca_selecionada)
+            config_atual = CONFIG_BANCAS[banca_selecionada]
         
-        # --- PROCESSAMENTO ---
-        df_top12, curr_loss_12, max_loss_12, max_win_12, curr_win_12 = gerar_backtest_e_status(historico)
-        palp_top12 = gerar_palpite_estrategico(historico)
+            # --- PROCESSAMENTO (UMA PASSADA, COMPARTILHADA COM O CENTRO DE ALERTAS) ---
+            contexto = contexto_em_cache(historico, banca_selecionada, aba_ativa)
+            df_top12, curr_loss_12, max_loss_12, max_win_12, curr_win_12 = contexto["top12"]
+            palp_top12 = contexto["palp_top12"]
         
-        df_setores, seq_visual = analisar_setores_bma_com_maximo(historico)
+            df_setores, seq_visual = contexto["setores"]
         
-        lista_bunker, df_bunker, max_loss_bun, curr_loss_bun, max_win_bun, curr_win_bun = analisar_dna_fixo_historico(historico)
+            lista_bunker, df_bunker, max_loss_bun, curr_loss_bun, max_win_bun, curr_win_bun = contexto["bunker"]
         
-        df_setor, lista_setor, risk_setor, curr_loss_set, max_win_set, curr_win_set = gerar_backtest_setorizado(historico)
+            df_setor, lista_setor, risk_setor, curr_loss_set, max_win_set, curr_win_set = contexto["setorizada"]
         
-        df_bma, palp_bma, crise_bma, trend_bma, risk_bma, curr_loss_bma, max_win_bma, curr_win_bma = gerar_backtest_bma(historico)
+            df_bma, palp_bma, crise_bma, trend_bma, risk_bma, curr_loss_bma, max_win_bma, curr_win_bma = contexto["bma"]
         
-        # --- CICLOS ---
-        bichos_faltantes, duracao_ciclo, historico_ciclos, progresso_ciclo = analisar_ciclo_atual(historico)
+            # --- CICLOS ---
+            bichos_faltantes, duracao_ciclo, historico_ciclos, progresso_ciclo = contexto["ciclo"]
+            percentis_ciclo, df_hist_ciclos = contexto["ciclo_stats"]
         
-        alertas, tipos, sugestoes = monitorar_oportunidades(historico, df_setores)
-
-        # Cabeçalho
-        col_head1, col_head2 = st.columns([1, 4])
-        with col_head1: st.image(config_atual['logo_url'], width=80)
-        with col_head2:
-            st.markdown(f"## {config_atual['display_name']}")
-            st.caption(f"Último: Grupo {historico[-1]:02} | Hora: {ultimo_horario_salvo}")
-
-        site_on, site_tit, _ = verificar_atualizacao_site(config_atual['url_site'])
-        if not site_on: st.warning(f"Status do Site: {site_tit}")
-
-        # --- PAINEL DE ALERTAS ---
-        if alertas:
-            with st.expander("🚨 CENTRO DE ALERTAS", expanded=True):
-                for i, alerta in enumerate(alertas):
-                    if tipos[i] == "erro": st.error(alerta)
-                    else: st.warning(alerta)
-                    if sugestoes[i]:
-                        st.info("👻 **MODO INVERSO (Os 13 do Contra):**")
-                        # Lista copiável
-                        txt_inv = ", ".join([f"{n:02}" for n in sugestoes[i]])
-                        st.code(txt_inv, language="text")
-
-        # --- ABAS PRINCIPAIS ---
-        tab_setores, tab_comp, tab_ciclos = st.tabs(["🎯 Setores & Estratégias", "🆚 Comparativo (2 Mesas)", "🔄 Ciclos"])
+            alertas, tipos, sugestoes = monitorar_oportunidades(contexto)
+
+            # Cabeçalho
+            col_head1, col_head2 = st.columns([1, 4])
+            with col_head1: st.image(config_atual['logo_url'], width=80)
+            with col_head2:
+                st.markdown(f"## {config_atual['display_name']}")
+                st.caption(f"Último: Grupo {historico[-1]:02} | Hora: {ultimo_horario_salvo}")
+
+            site_on, site_tit, _ = status_site(config_atual['url_site'])
+            if not site_on: st.warning(f"Status do Site: {site_tit}")
+
+            # --- PAINEL DE ALERTAS ---
+            if alertas:
+                with st.expander("🚨 CENTRO DE ALERTAS", expanded=True):
+                    for i, alerta in enumerate(alertas):
+                        if tipos[i] == "erro": st.error(alerta)
+                        else: st.warning(alerta)
+                        if sugestoes[i]:
+                            st.info("👻 **MODO INVERSO (Os 13 do Contra):**")
+                            # Lista copiável
+                            txt_inv = ", ".join([f"{n:02}" for n in sugestoes[i]])
+                            st.code(txt_inv, language="text")
+
+            # --- ABAS PRINCIPAIS ---
+            tab_setores, tab_comp, tab_ciclos, tab_horarios = st.tabs(["🎯 Setores & Estratégias", "🆚 Comparativo (2 Mesas)", "🔄 Ciclos", "🕒 Por Horário"])
         
-        with tab_setores:
-            st.write("Visual Recente (⬅️ Mais Novo):")
-            html_seq = "<div>"
-            for sigla, classe in seq_visual: html_seq += f"<div class='{classe}'>{sigla}</div>"
-            html_seq += "</div>"
-            st.markdown(html_seq, unsafe_allow_html=True)
-            st.markdown("---")
-            st.write("📊 **Tabela de Stress (Atraso vs Recorde):**")
-            st.table(df_setores)
+            with tab_setores:
+                st.write("Visual Recente (⬅️ Mais Novo):")
+                html_seq = "<div>"
+                for sigla, classe in seq_visual: html_seq += f"<div class='{classe}'>{sigla}</div>"
+                html_seq += "</div>"
+                st.markdown(html_seq, unsafe_allow_html=True)
+                st.markdown("---")
+                st.write("📊 **Tabela de Stress (Atraso vs Recorde):**")
+                st.table(df_setores)
             
-            c_strat1, c_strat2 = st.columns(2)
-            with c_strat1:
-                st.write("🔥 **Estratégia 1: BMA (Crise + Tendência)**")
-                st.caption(f"Foco: {crise_bma} + {trend_bma}")
-                st.table(df_bma)
-                st.warning(f"⚠️ Rec. Derrotas: {risk_bma} | 🏆 Rec. Vitórias: {max_win_bma}")
-                # CORREÇÃO: Palpite copiável
-                with st.expander("Ver Palpite BMA"): 
-                    st.code(", ".join([f"{n:02}" for n in palp_bma]), language="text")
+                c_strat1, c_strat2 = st.columns(2)
+                with c_strat1:
+                    st.write("🔥 **Estratégia 1: BMA (Crise + Tendência)**")
+                    st.caption(f"Foco: {crise_bma} + {trend_bma}")
+                    st.table(df_bma)
+                    st.warning(f"⚠️ Rec. Derrotas: {risk_bma} | 🏆 Rec. Vitórias: {max_win_bma}")
+                    # CORREÇÃO: Palpite copiável
+                    with st.expander("Ver Palpite BMA"): 
+                        st.code(", ".join([f"{n:02}" for n in palp_bma]), language="text")
                 
-            with c_strat2:
-                st.write("⚖️ **Estratégia 2: Setorizada (4x4x4)**")
-                st.caption("Equilíbrio dos 3 setores")
-                st.table(df_setor)
-                st.warning(f"⚠️ Rec. Derrotas: {risk_setor} | 🏆 Rec. Vitórias: {max_win_set}")
-                # CORREÇÃO: Palpite copiável
-                with st.expander("Ver Palpite Setorizada"): 
-                    st.code(", ".join([f"{n:02}" for n in lista_setor]), language="text")
-
-        with tab_comp:
-            col1, col2 = st.columns(2)
-            with col1:
-                st.subheader("🔥 Top 12 (Dinâmico)")
-                st.caption("Baseado na frequência recente")
-                st.table(df_top12)
-                st.warning(f"⚠️ Rec. Derrotas: {max_loss_12} | 🏆 Rec. Vitórias: {max_win_12}")
-                # CORREÇÃO: Palpite copiável
-                with st.expander("Ver Palpite Top 12"): 
-                    st.code(", ".join([f"{n:02}" for n in palp_top12]), language="text")
+                with c_strat2:
+                    st.write("⚖️ **Estratégia 2: Setorizada (4x4x4)**")
+                    st.caption("Equilíbrio dos 3 setores")
+                    st.table(df_setor)
+                    st.warning(f"⚠️ Rec. Derrotas: {risk_setor} | 🏆 Rec. Vitórias: {max_win_set}")
+                    # CORREÇÃO: Palpite copiável
+                    with st.expander("Ver Palpite Setorizada"): 
+                        st.code(", ".join([f"{n:02}" for n in lista_setor]), language="text")
+
+            with tab_comp:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.subheader("🔥 Top 12 (Dinâmico)")
+                    st.caption("Baseado na frequência recente")
+                    st.table(df_top12)
+                    st.warning(f"⚠️ Rec. Derrotas: {max_loss_12} | 🏆 Rec. Vitórias: {max_win_12}")
+                    # CORREÇÃO: Palpite copiável
+                    with st.expander("Ver Palpite Top 12"): 
+                        st.code(", ".join([f"{n:02}" for n in palp_top12]), language="text")
                 
-            with col2:
-                st.subheader("🧬 Bunker 12 (Fixo)")
-                st.caption("Baseado na frequência histórica total")
-                st.table(df_bunker)
-                st.warning(f"⚠️ Rec. Derrotas: {max_loss_bun} | 🏆 Rec. Vitórias: {max_win_bun}")
-                # CORREÇÃO: Palpite copiável
-                with st.expander("Ver Palpite Bunker"): 
-                    st.code(", ".join([f"{n:02}" for n in lista_bunker]), language="text")
+                with col2:
+                    st.subheader("🧬 Bunker 12 (Fixo)")
+                    st.caption("Baseado na frequência histórica total")
+                    st.table(df_bunker)
+                    st.warning(f"⚠️ Rec. Derrotas: {max_loss_bun} | 🏆 Rec. Vitórias: {max_win_bun}")
+                    # CORREÇÃO: Palpite copiável
+                    with st.expander("Ver Palpite Bunker"): 
+                        st.code(", ".join([f"{n:02}" for n in lista_bunker]), language="text")
         
-        with tab_ciclos:
-            st.subheader("🔄 Monitor de Ciclos (1-25)")
-            st.write(f"**Status Atual:** {progresso_ciclo} de 25 bichos já saíram.")
-            st.progress(progresso_ciclo / 25)
+            with tab_ciclos:
+                st.subheader("🔄 Monitor de Ciclos (1-25)")
+                st.write(f"**Status Atual:** {progresso_ciclo} de 25 bichos já saíram.")
+                st.progress(progresso_ciclo / 25)
             
-            col_c1, col_c2 = st.columns(2)
-            with col_c1:
-                st.metric("Jogos no Ciclo Atual", f"{duracao_ciclo} Jogos")
-            with col_c2:
-                if historico_ciclos:
-                    avg_ciclo = sum(historico_ciclos) / len(historico_ciclos)
-                    st.metric("Média Histórica para Fechar", f"{avg_ciclo:.1f} Jogos")
+                col_c1, col_c2 = st.columns(2)
+                with col_c1:
+                    st.metric("Jogos no Ciclo Atual", f"{duracao_ciclo} Jogos")
+                with col_c2:
+                    if historico_ciclos:
+                        avg_ciclo = sum(historico_ciclos) / len(historico_ciclos)
+                        st.metric("Média Histórica para Fechar", f"{avg_ciclo:.1f} Jogos")
             
-            st.markdown("### 🎯 Faltam Sair (Sugestão de Jogo):")
-            if bichos_faltantes:
-                txt_ciclo = ", ".join([f"{n:02}" for n in bichos_faltantes])
-                st.code(txt_ciclo, language="text")
-            else:
-                st.success("O ciclo acabou de fechar! Um novo começou agora.")
+                if percentis_ciclo:
+                    st.write("📏 **Duração dos Ciclos Fechados (Percentis):**")
+                    cols_p = st.columns(len(percentis_ciclo))
+                    for col_p, (p, dur) in zip(cols_p, percentis_ciclo.items()):
+                        with col_p: st.metric(f"P{p}", f"{dur} Jogos")
+                    with st.expander("📊 Histograma de Durações"):
+                        st.bar_chart(df_hist_ciclos)
+            
+                st.markdown("### 🎯 Faltam Sair (Sugestão de Jogo):")
+                if bichos_faltantes:
+                    txt_ciclo = ", ".join([f"{n:02}" for n in bichos_faltantes])
+                    st.code(txt_ciclo, language="text")
+                else:
+                    st.success("O ciclo acabou de fechar! Um novo começou agora.")
 
-        st.markdown("---")
-        with st.expander("🕒 Grade de Horários da Banca"):
-            st.write(config_atual['horarios'])
+            with tab_horarios:
+                st.subheader("🕒 Análise por Horário")
+                st.caption("Cada horário analisado só com os sorteios dele")
+                por_horario = contexto["por_horario"]
+                if por_horario:
+                    st.table(montar_tabela_horarios(por_horario))
+                    horario_foco = st.selectbox("Detalhar horário:", list(por_horario.keys()), key="horario_analise")
+                    foco = por_horario[horario_foco]
+                    st.write(f"📊 **Stress dos Setores às {horario_foco}:**")
+                    st.table(foco["setores"])
+                    st.write("🎯 **Faltam Sair no Ciclo deste Horário:**")
+                    if foco["ciclo"][0]: st.code(", ".join(f"{n:02}" for n in foco["ciclo"][0]), language="text")
+                    else: st.success("O ciclo deste horário acabou de fechar!")
+                else: st.info("Sem horários registrados na planilha.")
 
+            st.markdown("---")
+            with st.expander("🕒 Grade de Horários da Banca"):
+                st.write(config_atual['horarios'])
+
+        else:
+            st.warning("⚠️ Planilha vazia. Adicione o primeiro resultado.")
     else:
-        st.warning("⚠️ Planilha vazia. Adicione o primeiro resultado.")
-else:
-    st.info("Conectando...")
+        st.info("Conectando...")
+
+with st.sidebar:
+    st.header("🦅 MENU DE JOGO")
+    modo_visao = st.radio("Visão:", ["🎯 Banca Selecionada", "🗺️ Visão Geral"], horizontal=True)
+    banca_selecionada = st.selectbox("Selecione a Banca:", BANCA_OPCOES)
+    config_banca = CONFIG_BANCAS[banca_selecionada]
+    
+    fuso_br = pytz.timezone('America/Sao_Paulo')
+    dia_semana = datetime.now(fuso_br).weekday()
+    lista_horarios = horarios_do_dia(config_banca, dia_semana)
+    
+    if st.session_state.get('auto_horario_idx', 0) >= len(lista_horarios):
+        st.session_state['auto_horario_idx'] = 0
+    
+    st.markdown("---")
+    
+    c_link, _ = st.columns([1, 0.1])
+    with c_link:
+        st.link_button("🔗 Ver Site Oficial", config_banca['url_site'])
+    
+    painel_registro(banca_selecionada, config_banca, lista_horarios)
+
+# --- MODO VISÃO GERAL (TRIAGEM DE TODAS AS BANCAS NUMA CARGA SÓ) ---
+if modo_visao == "🗺️ Visão Geral":
+    st.markdown("## 🗺️ VISÃO GERAL DAS BANCAS")
+    with st.spinner("Carregando todas as bancas em paralelo..."):
+        resultados_gerais = carregar_visao_geral()
+    if resultados_gerais:
+        st.table(montar_matriz_alertas(resultados_gerais))
+        st.caption("🔴 Derrotas perto do recorde | 🛑 Vitórias perto do recorde | 🟢 Normal (D = derrotas seguidas, V = vitórias seguidas) | SETORES: atraso igualou o recorde")
+
+        # --- SINAIS ENTRE BANCAS ---
+        st.markdown("### 🔗 Sinais Entre Bancas")
+        linhas_cruzadas = {banca: linha_do_tempo(carregar_historico_colunar(conectar_planilha(banca))) for banca in BANCA_OPCOES}
+        lag_cruzado = st.radio("Sorteios depois:", DEFASAGENS_CRUZADAS, horizontal=True, format_func=lambda l: f"+{l}")
+        memoria_cruz = memoria_cruzada()
+        with memoria_cruz["lock"]:
+            estado_cruzado = avancar_cruzado(memoria_cruz["estado"], linhas_cruzadas)
+            df_sinais = sinais_entre_bancas(estado_cruzado, linhas_cruzadas, lag_cruzado)
+            matrizes_co = {par: m.copy() for par, m in estado_cruzado["coocorrencia"].items()}
+        if not df_sinais.empty:
+            st.table(df_sinais.set_index("ORIGEM"))
+            st.caption("Grupos que mais saíram na banca alvo logo depois do último grupo da origem (contagem histórica)")
+        with st.expander("🧮 Coocorrência (sorteios a até 30 min)"):
+            if matrizes_co:
+                par_co = st.selectbox("Par de bancas:", list(matrizes_co.keys()), format_func=lambda p: f"{CONFIG_BANCAS[p[0]]['display_name']} x {CONFIG_BANCAS[p[1]]['display_name']}")
+                rotulos = [f"{g:02}" for g in range(1, 26)]
+                st.dataframe(pd.DataFrame(matrizes_co[par_co], index=rotulos, columns=rotulos))
+    else: st.info("Conectando...")
+    st.stop()
+
+sonda_sites()  # Liga a sonda antes da carga da planilha (só na primeira vez do processo)
+painel_analise(banca_selecionada)
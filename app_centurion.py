@@ -8,6 +8,7 @@ import re
 from datetime import datetime, date, timedelta
 import time
 from collections import Counter
+from espelho_local import espelhar
 
 # --- IMPORTAÇÃO DA INTELIGÊNCIA ARTIFICIAL ---
 try:
@@ -65,7 +66,7 @@ def conectar_planilha():
         gc = gspread.authorize(creds)
         try:
             sh = gc.open("CentralBichos")
-            return sh.worksheet(CONFIG_TRADICIONAL['aba'])
+            return espelhar(sh.worksheet(CONFIG_TRADICIONAL['aba']))
         except: return None
     return None
 
@@ -1,13 +1,16 @@
 import streamlit as st
 import pandas as pd
-from collections import Counter
+import numpy as np
 import gspread
 from google.oauth2.service_account import Credentials
 import requests
 from datetime import datetime, date, timedelta
 import time
+import threading
+import bisect
 import re
 from bs4 import BeautifulSoup
+from espelho_local import DivergenciaEspelho, aba_aberta, espelhar
 import altair as alt
 
 # =============================================================================
@@ -145,34 +148,68 @@ def conectar_planilha():
         gc = gspread.authorize(credentials)
         try:
             sh = gc.open("CentralBichos")
-            return sh.worksheet("TRADICIONAL")
+            return espelhar(sh.worksheet("TRADICIONAL"))
         except: return None
     return None
 
+# Número e conteúdo da última linha ocupada da aba: vistos a cada carga e mantidos em
+# dia pelos nossos appends, para o "Apagar Último" conferir com uma leitura só.
+@st.cache_resource(show_spinner=False)
+def indice_linhas():
+    return {"lock": threading.Lock(), "total": None, "linha": None}
+
+def linha_limpa(valores):
+    # Células como texto, sem vazios no fim (formato das leituras por intervalo)
+    linha = [str(v).strip() for v in valores]
+    while linha and not linha[-1]: linha.pop()
+    return linha
+
+def conferir_ultima_linha(worksheet, indice):
+    # Chamar com indice["lock"] na mão. A leitura A{total}:D tem que trazer exatamente a última
+    # linha conhecida e nada depois; senão a aba é relida e vale a última linha real.
+    total = indice["total"]
+    if total and indice["linha"] is not None:
+        cauda = [linha_limpa(r) for r in worksheet.batch_get([f"A{total}:D"])[0]]
+        if cauda == [indice["linha"]]: return total
+    dados = worksheet.get_all_values()
+    indice["total"] = len(dados); indice["linha"] = linha_limpa(dados[-1]) if dados else None
+    return indice["total"]
+
+def linha_do_append(resposta):
+    # A resposta do append traz o intervalo gravado (ex: "TRADICIONAL!A812:D812")
+    try:
+        m = re.search(r'![A-Z]+(\d+)', resposta["updates"]["updatedRange"])
+        return int(m.group(1)) if m else None
+    except: return None
+
 def carregar_dados():
     worksheet = conectar_planilha()
     if worksheet:
         dados = worksheet.get_all_values()
+        indice = indice_linhas()
+        with indice["lock"]: indice["total"] = len(dados); indice["linha"] = linha_limpa(dados[-1]) if dados else None
         lista_duques = []
         ultimo_horario = "--:--"
         ultima_data = "--/--/--"
         try:
             for row in dados:
-                if len(row) >= 2 and row[0].isdigit() and row[1].isdigit():
-                    g1, g2 = int(row[0]), int(row[1])
-                    lista_duques.append(tuple(sorted((g1, g2))))
+                if len(row) >= 2 and row[0].isdigit() and row[1].isdigit() and 1 <= int(row[0]) <= 25 and 1 <= int(row[1]) <= 25:
+                    lista_duques.append(id_do_duque(int(row[0]), int(row[1])))
                     if len(row) >= 3: ultimo_horario = row[2]
                     if len(row) >= 4: ultima_data = row[3] # Pega a data da coluna 4
         except: pass
-        return lista_duques, ultimo_horario, ultima_data
-    return [], "--:--", "--/--/--"
+        return np.array(lista_duques, dtype=np.uint16), ultimo_horario, ultima_data
+    return np.zeros(0, dtype=np.uint16), "--:--", "--/--/--"
 
 def salvar_duque(b1, b2, horario, data_ref):
     worksheet = conectar_planilha()
     if worksheet:
         try:
             data_str = data_ref.strftime("%Y-%m-%d")
-            worksheet.append_row([int(b1), int(b2), str(horario), data_str])
+            linha = [int(b1), int(b2), str(horario), data_str]
+            resposta = worksheet.append_row(linha)
+            indice = indice_linhas()
+            with indice["lock"]: indice["total"] = linha_do_append(resposta); indice["linha"] = linha_limpa(linha)
             return True
         except: return False
     return False
@@ -181,11 +218,30 @@ def deletar_ultimo():
     worksheet = conectar_planilha()
     if worksheet:
         try:
-            total = len(worksheet.get_all_values())
-            if total > 0: worksheet.delete_rows(total); return True
+            indice = indice_linhas()
+            with indice["lock"]:
+                # O espelho confere de novo com a planilha e recusa (DivergenciaEspelho) se ela mudou
+                for tentativa in range(2):
+                    total = conferir_ultima_linha(worksheet, indice)
+                    if not total: return False
+                    try:
+                        worksheet.delete_rows(total); break
+                    except DivergenciaEspelho: indice["total"] = None
+                else: return False
+                indice["total"] = None; indice["linha"] = None  # Nova última linha: confere na próxima
+                return True
         except: return False
     return False
 
+def mostrar_situacao_fila(worksheet):
+    # Gravações que ainda não chegaram na planilha (fila do espelho local)
+    if not worksheet: return
+    situacao = worksheet.situacao_fila()
+    if situacao["erro"]: st.warning(f"⚠️ {situacao['pendentes']} gravação(ões) ainda não chegaram na planilha. Último erro: {situacao['erro']}")
+    if situacao["falhas"]:
+        st.error("❌ NÃO GRAVADO na planilha (desistiu após várias tentativas): " + " | ".join(" ".join(str(v) for v in l) for l in situacao["falhas"]))
+        if st.button("OK, vou registrar de novo", key="dispensar_falhas_fila"): worksheet.dispensar_falhas(); st.rerun()
+
 def montar_url_correta(slug, data_alvo):
     hoje = date.today()
     delta = (hoje - data_alvo).days
@@ -239,107 +295,110 @@ def raspar_duque_avancado(data_alvo, horario_alvo):
 # =============================================================================
 # --- 3. LÓGICA V8.0 (SNIPER & FERRAMENTAS) ---
 # =============================================================================
-def gerar_universo_duques():
-    todos = []
-    for i in range(1, 26):
-        for j in range(i, 26): todos.append((i, j))
-    setor1 = [d for k, d in enumerate(todos) if k % 3 == 0]
-    setor2 = [d for k, d in enumerate(todos) if k % 3 == 1]
-    setor3 = [d for k, d in enumerate(todos) if k % 3 == 2]
-    return todos, {"SETOR 1 (S1)": setor1, "SETOR 2 (S2)": setor2, "SETOR 3 (S3)": setor3}
-
-def formatar_palpite_texto(lista_tuplas):
-    lista_ordenada = sorted(list(set(lista_tuplas)))
+# Universo montado uma vez: cada duque é um id inteiro de 0 a 324, na ordem
+# lexicográfica dos pares (01-01, 01-02, ..., 25-25). Setor, "limpo" e sequência
+# viram arrays de consulta e o histórico fica num array uint16 de ids.
+def montar_universo_ids():
+    duques = np.array([(i, j) for i in range(1, 26) for j in range(i, 26)], dtype=np.uint8)
+    ids = np.arange(len(duques))
+    id_por_par = np.full((26, 26), -1, dtype=np.int16)
+    id_por_par[duques[:, 0], duques[:, 1]] = ids; id_por_par[duques[:, 1], duques[:, 0]] = ids
+    diferenca = duques[:, 1].astype(np.int16) - duques[:, 0]
+    sequencia = (diferenca == 1) | ((duques[:, 0] == 1) & (duques[:, 1] == 25))
+    return duques, id_por_par, (ids % 3).astype(np.uint8), sequencia, (diferenca != 0) & ~sequencia
+
+DUQUES, ID_POR_PAR, SETOR_DO_DUQUE, EH_SEQUENCIA, EH_LIMPO = montar_universo_ids()
+IDS_LIMPOS = np.flatnonzero(EH_LIMPO)  # Os 275 duques sem repetição e sem sequência
+TOTAL_DUQUES = len(DUQUES)
+NOMES_SETORES_DUQUE = ["SETOR 1 (S1)", "SETOR 2 (S2)", "SETOR 3 (S3)"]
+
+def id_do_duque(b1, b2):
+    return int(ID_POR_PAR[b1, b2])
+
+def duque_do_id(id_duque):
+    return int(DUQUES[id_duque, 0]), int(DUQUES[id_duque, 1])
+
+def formatar_palpite_texto(ids_duques):
     texto = ""
-    for i, p in enumerate(lista_ordenada):
-        texto += f"[{p[0]:02}-{p[1]:02}] "
+    for i, id_duque in enumerate(np.unique(np.asarray(ids_duques, dtype=np.int64))):
+        b1, b2 = duque_do_id(id_duque)
+        texto += f"[{b1:02}-{b2:02}] "
         if (i + 1) % 10 == 0: texto += "\n" 
     return texto.strip()
 
 # --- FUNÇÕES DE LIMPEZA ---
-def verificar_sequencia_bichos(duque):
-    b1, b2 = sorted(duque)
-    if b2 - b1 == 1: return True
-    if b1 == 1 and b2 == 25: return True
-    return False
+def verificar_sequencia_bichos(id_duque):
+    return bool(EH_SEQUENCIA[id_duque])
+
+def ranking_por_score(ids, scores, quantidade):
+    # Maiores scores primeiro; empate fica com o menor id (mesmo desempate do sorted estável)
+    return ids[np.argsort(-scores, kind="stable")[:quantidade]]
+
+# --- SNIPER V8 e V6 (CHAVE INTEIRA + SELEÇÃO PARCIAL) ---
+# Os scores do sniper são inteiros, então score * 325 + (324 - id) é uma chave única que já
+# embute o desempate pelo menor id: o top 200 sai de um argpartition, sem ordenar tudo.
+JANELAS_SNIPER = (15, 50, 100)
+TAMANHO_SNIPER = 200
+DESEMPATE_ID = np.arange(TOTAL_DUQUES - 1, -1, -1, dtype=np.int64)
+
+def montar_vicio():
+    # vicio[u, d]: o duque d tem algum bicho do duque u ou vizinho dele (25 -> 01 dá a volta)
+    vicio = np.zeros((TOTAL_DUQUES, TOTAL_DUQUES), dtype=bool)
+    for u, par in enumerate(DUQUES):
+        bichos = np.zeros(26, dtype=bool)
+        for b in map(int, par): bichos[[b, b % 25 + 1, (b - 2) % 25 + 1]] = True
+        vicio[u] = bichos[DUQUES[:, 0]] | bichos[DUQUES[:, 1]]
+    return vicio
+
+VICIO_DO_DUQUE = montar_vicio()
+
+def chaves_sniper_v8(c_medio):
+    # V8: só o universo limpo concorre (-1 fica abaixo de qualquer chave válida)
+    return np.where(EH_LIMPO, c_medio.astype(np.int64) * TOTAL_DUQUES + DESEMPATE_ID, -1)
+
+def chaves_sniper_v6(c_curto, c_longo, ultimo=None):
+    score = c_curto.astype(np.int64) * 5 + c_longo
+    if ultimo is not None: score = score + 500 * VICIO_DO_DUQUE[ultimo]
+    return score * TOTAL_DUQUES + DESEMPATE_ID
+
+def top_por_chave(chaves, quantidade=TAMANHO_SNIPER):
+    return np.sort(np.argpartition(-chaves, quantidade - 1)[:quantidade])
 
-def gerar_universo_limpo_275():
-    todos, _ = gerar_universo_duques()
-    universo_limpo = []
-    for d in todos:
-        if d[0] == d[1]: continue
-        if verificar_sequencia_bichos(d): continue
-        universo_limpo.append(d)
-    return universo_limpo
-
-# --- SNIPER V8 e V6 ---
 def gerar_sniper_sequencia_v8(historico_slice):
-    hist_rev = historico_slice[::-1]
-    pool_275 = gerar_universo_limpo_275()
-    c_medio = Counter(hist_rev[:50])
-    rank_final = sorted(pool_275, key=lambda x: c_medio[x], reverse=True)
-    top_200 = rank_final[:200]
-    return sorted(top_200)
+    return top_por_chave(chaves_sniper_v8(np.bincount(historico_slice[-50:], minlength=TOTAL_DUQUES)))
 
 def gerar_sniper_top200_v6(historico_slice):
-    hist_rev = historico_slice[::-1]
-    todos_duques, _ = gerar_universo_duques()
-    c_curto = Counter(hist_rev[:15])
-    c_longo = Counter(hist_rev[:100])
-    
-    if len(historico_slice) > 0:
-        ultimo = historico_slice[-1]
-        bichos_vicio = set([ultimo[0], ultimo[1]])
-        for b in list(bichos_vicio):
-            bichos_vicio.add(b + 1 if b < 25 else 1)
-            bichos_vicio.add(b - 1 if b > 1 else 25)
-    else:
-        bichos_vicio = set()
-
-    scores = {}
-    for d in todos_duques:
-        score = 0
-        score += c_curto[d] * 5.0
-        score += c_longo[d] * 1.0
-        if d[0] in bichos_vicio or d[1] in bichos_vicio:
-            score += 500.0
-        scores[d] = score
-        
-    rank_final = sorted(scores.items(), key=lambda x: -x[1])
-    top_200 = [d for d, s in rank_final][:200]
-    return sorted(top_200)
-
-# --- BACKTEST E MAX LOSS (SNIPER) ---
-def executar_backtest_duque(historico):
-    resultados_backtest = []
-    for i in range(1, 5):
-        if len(historico) <= i + 50: break 
-        target_duque = tuple(sorted(historico[-i]))
-        hist_treino = historico[:-i] 
-        ultimo_jogo_treino = hist_treino[-1]
-        
-        if verificar_sequencia_bichos(ultimo_jogo_treino):
-            sniper_past = gerar_sniper_sequencia_v8(hist_treino)
-            tipo = "SEQUÊNCIA"
-        else:
-            sniper_past = gerar_sniper_top200_v6(hist_treino)
-            tipo = "NORMAL"
-        
-        win = target_duque in sniper_past
-        resultados_backtest.append({ "index": i, "duque_real": target_duque, "vitoria": win, "tipo": tipo })
-    return resultados_backtest
-
-def calcular_max_derrotas_duque(historico):
+    c_curto = np.bincount(historico_slice[-15:], minlength=TOTAL_DUQUES)
+    c_longo = np.bincount(historico_slice[-100:], minlength=TOTAL_DUQUES)
+    return top_por_chave(chaves_sniper_v6(c_curto, c_longo, historico_slice[-1] if len(historico_slice) else None))
+
+def gerar_sniper(historico_slice):
+    # V8 depois de um duque em sequência, V6 nos demais
+    if verificar_sequencia_bichos(historico_slice[-1]): return gerar_sniper_sequencia_v8(historico_slice), "SEQUÊNCIA"
+    return gerar_sniper_top200_v6(historico_slice), "NORMAL"
+
+# --- WALK-FORWARD DO SNIPER (CONTAGENS DESLIZANTES) ---
+def caminhar_sniper(historico, inicio):
+    # Para cada t em [inicio, fim): sniper treinado em historico[:t] contra historico[t].
+    # As janelas 15/50/100 andam um sorteio por passo (+1 entra, -1 sai): tempo linear.
+    historico = np.asarray(historico, dtype=np.int64)
+    inicio = max(1, inicio)
+    contagens = {j: np.bincount(historico[max(0, inicio - j):inicio], minlength=TOTAL_DUQUES) for j in JANELAS_SNIPER}
+    passos = []
+    for t in range(inicio, len(historico)):
+        ultimo = historico[t - 1]
+        if EH_SEQUENCIA[ultimo]: chaves, tipo = chaves_sniper_v8(contagens[50]), "SEQUÊNCIA"
+        else: chaves, tipo = chaves_sniper_v6(contagens[15], contagens[100], ultimo), "NORMAL"
+        # Acerta se o duque sorteado está entre as 200 maiores chaves
+        passos.append((bool((chaves > chaves[historico[t]]).sum() < TAMANHO_SNIPER), tipo))
+        for janela, contagem in contagens.items():
+            contagem[historico[t]] += 1
+            if t - janela >= 0: contagem[historico[t - janela]] -= 1
+    return passos
+
+def maior_sequencia_derrotas(acertos):
     max_derrotas = 0; derrotas_consecutivas_temp = 0
-    range_analise = min(50, len(historico) - 50)
-    start_idx = len(historico) - range_analise
-    for i in range(start_idx, len(historico)):
-        target_duque = tuple(sorted(historico[i]))
-        hist_treino = historico[:i]
-        ultimo_jogo_treino = hist_treino[-1]
-        if verificar_sequencia_bichos(ultimo_jogo_treino): sniper_past = gerar_sniper_sequencia_v8(hist_treino)
-        else: sniper_past = gerar_sniper_top200_v6(hist_treino)
-        win = target_duque in sniper_past
+    for win in acertos:
         if not win: derrotas_consecutivas_temp += 1
         else:
             if derrotas_consecutivas_temp > max_derrotas: max_derrotas = derrotas_consecutivas_temp
@@ -347,114 +406,197 @@ def calcular_max_derrotas_duque(historico):
     if derrotas_consecutivas_temp > max_derrotas: max_derrotas = derrotas_consecutivas_temp
     return max_derrotas
 
+# --- BACKTEST E MAX LOSS (SNIPER) ---
+def executar_backtest_duque(historico):
+    # Cartões dos últimos 4 jogos (cada um precisa de mais de 50 jogos de treino)
+    qtd = max(0, min(4, len(historico) - 51))
+    if not qtd: return []
+    passos = caminhar_sniper(historico, len(historico) - qtd)
+    return [{ "index": i, "duque_real": duque_do_id(historico[-i]), "vitoria": passos[-i][0], "tipo": passos[-i][1] } for i in range(1, qtd + 1)]
+
+def calcular_max_derrotas_duque(historico, janela=50):
+    # janela=None avalia o histórico inteiro (sempre com pelo menos 50 jogos de treino)
+    range_analise = min(len(historico) if janela is None else janela, len(historico) - 50)
+    if range_analise <= 0: return 0
+    return maior_sequencia_derrotas(win for win, _ in caminhar_sniper(historico, len(historico) - range_analise))
+
+# Recorde do histórico todo guardado no processo (mesma chave do índice: tamanho + último id).
+# Cada carga só caminha os jogos novos; histórico encolhido ou último jogo trocado refaz do zero.
+@st.cache_resource(show_spinner=False)
+def memoria_recorde_duque():
+    return {"lock": threading.Lock(), "n": 0, "ultimo": None, "maximo": 0, "atual": 0}
+
+def recorde_derrotas_duque(historico, memoria):
+    # Mesmo valor de calcular_max_derrotas_duque(historico, janela=None)
+    with memoria["lock"]:
+        n = memoria["n"]
+        if len(historico) < n or (n and historico[n - 1] != memoria["ultimo"]):
+            memoria.update(n=0, ultimo=None, maximo=0, atual=0); n = 0
+        for win, _ in caminhar_sniper(historico, max(n, 50)):
+            memoria["atual"] = 0 if win else memoria["atual"] + 1
+            if memoria["atual"] > memoria["maximo"]: memoria["maximo"] = memoria["atual"]
+        memoria["n"] = len(historico)
+        memoria["ultimo"] = historico[-1] if len(historico) else None
+        return memoria["maximo"]
+
 # =============================================================================
 # --- 4. LÓGICA V9.1 (EFEITO BORBOLETA COM LINHAS) ---
 # =============================================================================
-def gerar_palpite_eco_historico(historico_slice, target_size=125):
-    if len(historico_slice) < 5: return [], 0, []
-    
-    ultimo_duque = tuple(sorted(historico_slice[-1]))
-    palpite_set = set()
-    ocorrencias_indices = []
-    
-    # 1. Encontrar todas as vezes que esse duque saiu
-    for i in range(len(historico_slice) - 1): 
-        atual = tuple(sorted(historico_slice[i]))
-        if atual == ultimo_duque:
-            ocorrencias_indices.append(i)
-            
-    num_ocorrencias = len(ocorrencias_indices)
-    
-    # 2. Coletar resultados futuros
-    step = 1; max_step = 10 
-    while len(palpite_set) < target_size and step <= max_step:
-        for idx in ocorrencias_indices:
-            next_idx = idx + step
-            if next_idx < len(historico_slice): 
-                futuro = tuple(sorted(historico_slice[next_idx]))
-                if futuro[0] != futuro[1] and not verificar_sequencia_bichos(futuro):
-                    palpite_set.add(futuro)
+# --- ÍNDICE INVERTIDO (DUQUE -> POSIÇÕES NO HISTÓRICO) ---
+# As posições de cada duque ficam em ordem crescente; "ocorrências antes de i" é uma
+# busca binária. O índice do processo só recebe as posições novas a cada carga.
+def novo_indice_ocorrencias():
+    return {"n": 0, "ultimo": None, "posicoes": [[] for _ in range(TOTAL_DUQUES)]}
+
+def atualizar_indice_ocorrencias(indice, historico):
+    # Refaz do zero se o histórico encolheu ou o último jogo indexado mudou (apagar/regravar)
+    n = indice["n"]
+    if len(historico) < n or (n and historico[n - 1] != indice["ultimo"]):
+        indice.update(novo_indice_ocorrencias()); n = 0
+    posicoes = indice["posicoes"]
+    for pos in range(n, len(historico)): posicoes[historico[pos]].append(pos)
+    indice["n"] = len(historico)
+    indice["ultimo"] = historico[-1] if len(historico) else None
+    return indice
+
+@st.cache_resource(show_spinner=False)
+def memoria_ocorrencias():
+    return {"lock": threading.Lock(), "indice": novo_indice_ocorrencias(), "transicoes": novo_tensor_transicoes()}
+
+def ocorrencias_antes(indice, id_duque, limite):
+    posicoes = indice["posicoes"][id_duque]
+    return posicoes[:bisect.bisect_left(posicoes, limite)]
+
+# --- TABELA DE TRANSIÇÕES (DUQUE, PASSO K) -> SEGUIDORES ---
+# contagem[k - 1, a, b] = quantas vezes o duque b saiu k jogos depois do duque a, para k de 1
+# a 10. Cabe inteira num array denso (10 x 325 x 325); o eco vira consulta numa linha dela.
+PASSOS_ECO = 10
+
+def novo_tensor_transicoes():
+    return {"n": 0, "ultimo": None, "contagem": np.zeros((PASSOS_ECO, TOTAL_DUQUES, TOTAL_DUQUES), dtype=np.int32)}
+
+def somar_transicoes(contagem, historico, inicio, fim, sinal=1):
+    # Soma (ou tira, com sinal=-1) de uma vez os pares (j - k, j) cujo seguidor j cai em [inicio, fim)
+    for passo in range(1, PASSOS_ECO + 1):
+        seguidores = np.arange(max(inicio, passo), fim)
+        if not len(seguidores): continue
+        pares = historico[seguidores - passo].astype(np.int64) * TOTAL_DUQUES + historico[seguidores]
+        contagem[passo - 1] += sinal * np.bincount(pares, minlength=TOTAL_DUQUES * TOTAL_DUQUES).reshape(TOTAL_DUQUES, TOTAL_DUQUES)
+    return contagem
+
+def avancar_transicoes(contagem, historico, pos):
+    # O sorteio pos vira seguidor dos 10 anteriores (um par por passo, sem repetição de célula)
+    passos = np.arange(1, min(PASSOS_ECO, pos) + 1)
+    contagem[passos - 1, historico[pos - passos], historico[pos]] += 1
+
+def atualizar_tensor_transicoes(tensor, historico):
+    # Mesmo critério do índice: refaz do zero se o histórico encolheu ou o último jogo mudou
+    n = tensor["n"]
+    if len(historico) < n or (n and historico[n - 1] != tensor["ultimo"]):
+        tensor.update(novo_tensor_transicoes()); n = 0
+    if len(historico) - n <= PASSOS_ECO:
+        for pos in range(n, len(historico)): avancar_transicoes(tensor["contagem"], historico, pos)
+    else: somar_transicoes(tensor["contagem"], historico, n, len(historico))
+    tensor["n"] = len(historico)
+    tensor["ultimo"] = historico[-1] if len(historico) else None
+    return tensor
+
+def palpite_eco(contagem, ultimo_duque, c_geral, target_size=125):
+    # Seguidores limpos do gatilho no passo 1, depois no 2, ... até completar (ou passo 10);
+    # o resto sai do ranking geral. contagem e c_geral são do mesmo trecho do histórico.
+    palpite = np.zeros(TOTAL_DUQUES, dtype=bool)
+    step = 1
+    while palpite.sum() < target_size and step <= PASSOS_ECO:
+        palpite |= (contagem[step - 1, ultimo_duque] > 0) & EH_LIMPO
         step += 1
         
-    if len(palpite_set) < target_size:
-        pool_275 = gerar_universo_limpo_275()
-        c_geral = Counter(historico_slice)
-        rank_geral = sorted(pool_275, key=lambda x: c_geral[x], reverse=True)
-        for d in rank_geral:
-            if len(palpite_set) >= target_size: break
-            palpite_set.add(d)
+    faltam = target_size - int(palpite.sum())
+    if faltam > 0:
+        rank_geral = ranking_por_score(IDS_LIMPOS, c_geral[IDS_LIMPOS], TOTAL_DUQUES)
+        palpite[rank_geral[~palpite[rank_geral]][:faltam]] = True
             
-    return sorted(list(palpite_set)), num_ocorrencias, ocorrencias_indices
+    return np.flatnonzero(palpite)
+
+def gerar_palpite_eco_historico(historico_slice, target_size=125, indice=None, transicoes=None):
+    # O índice pode cobrir um histórico maior (só posições antes do fim do slice contam);
+    # a tabela de transições precisa ser exatamente a do slice.
+    if len(historico_slice) < 5: return [], 0, []
+    if indice is None: indice = atualizar_indice_ocorrencias(novo_indice_ocorrencias(), historico_slice)
+    if transicoes is None: transicoes = atualizar_tensor_transicoes(novo_tensor_transicoes(), historico_slice)
+    ultimo_duque = historico_slice[-1]
+    ocorrencias_indices = ocorrencias_antes(indice, ultimo_duque, len(historico_slice) - 1)
+    palpite = palpite_eco(transicoes["contagem"], ultimo_duque, np.bincount(historico_slice, minlength=TOTAL_DUQUES), target_size)
+    return palpite, len(ocorrencias_indices), ocorrencias_indices
+
+def seguidores_ranqueados(contagem, id_duque, quantidade=20):
+    # Quem mais veio depois do duque somando os 10 passos; empate vai para o passo 1, depois o menor id
+    frequencias = contagem[:, id_duque].astype(np.int64)
+    total = frequencias.sum(axis=0)
+    ordem = np.lexsort((np.arange(TOTAL_DUQUES), -frequencias[0], -total))
+    ordem = ordem[total[ordem] > 0][:quantidade]
+    soma_total = total.sum()
+    return pd.DataFrame({
+        "DUQUE": [f"{b1:02}-{b2:02}" for b1, b2 in DUQUES[ordem]],
+        "PASSO 1": frequencias[0, ordem], "PASSOS 1-3": frequencias[:3, ordem].sum(axis=0), "PASSOS 1-10": total[ordem],
+        "% (1-10)": np.round(total[ordem] / soma_total * 100, 1) if soma_total else np.zeros(len(ordem))
+    })
 
 # --- BACKTEST PARA BORBOLETA ---
-def executar_backtest_borboleta(historico):
-    resultados_backtest = []
-    for i in range(1, 5):
-        if len(historico) <= i + 50: break 
-        target_duque = tuple(sorted(historico[-i]))
-        hist_treino = historico[:-i]
-        sniper_past, _, _ = gerar_palpite_eco_historico(hist_treino, 125)
-        win = target_duque in sniper_past
-        resultados_backtest.append({ "index": i, "duque_real": target_duque, "vitoria": win })
-    return resultados_backtest
-
-def calcular_max_derrotas_borboleta(historico):
-    max_derrotas = 0; derrotas_consecutivas_temp = 0
-    range_analise = min(50, len(historico) - 50)
-    start_idx = len(historico) - range_analise
-    for i in range(start_idx, len(historico)):
-        target_duque = tuple(sorted(historico[i]))
-        hist_treino = historico[:i]
-        sniper_past, _, _ = gerar_palpite_eco_historico(hist_treino, 125)
-        win = target_duque in sniper_past
-        if not win: derrotas_consecutivas_temp += 1
-        else:
-            if derrotas_consecutivas_temp > max_derrotas: max_derrotas = derrotas_consecutivas_temp
-            derrotas_consecutivas_temp = 0
-    if derrotas_consecutivas_temp > max_derrotas: max_derrotas = derrotas_consecutivas_temp
-    return max_derrotas
+def caminhar_borboleta(historico, inicio, transicoes=None, target_size=125):
+    # Walk-forward: a tabela de transições de historico[:inicio] (a do processo sem a cauda, ou
+    # montada numa passada) e a contagem geral andam um jogo por vez; cada palpite é só consulta.
+    if transicoes is not None and transicoes["n"] == len(historico):
+        contagem = somar_transicoes(transicoes["contagem"].copy(), historico, inicio, len(historico), sinal=-1)
+    else: contagem = somar_transicoes(np.zeros((PASSOS_ECO, TOTAL_DUQUES, TOTAL_DUQUES), dtype=np.int32), historico, 0, inicio)
+    c_geral = np.bincount(historico[:inicio], minlength=TOTAL_DUQUES)
+    acertos = []
+    for i in range(inicio, len(historico)):
+        palpite = palpite_eco(contagem, historico[i - 1], c_geral, target_size) if i >= 5 else []
+        acertos.append(historico[i] in palpite)
+        avancar_transicoes(contagem, historico, i)
+        c_geral[historico[i]] += 1
+    return acertos
+
+def executar_backtest_borboleta(historico, transicoes=None):
+    qtd = max(0, min(4, len(historico) - 51))
+    if not qtd: return []
+    acertos = caminhar_borboleta(historico, len(historico) - qtd, transicoes)
+    return [{ "index": i, "duque_real": duque_do_id(historico[-i]), "vitoria": acertos[-i] } for i in range(1, qtd + 1)]
+
+def calcular_max_derrotas_borboleta(historico, janela=50, transicoes=None):
+    # janela=None avalia o histórico inteiro (sempre com pelo menos 50 jogos de treino)
+    range_analise = min(len(historico) if janela is None else janela, len(historico) - 50)
+    if range_analise <= 0: return 0
+    return maior_sequencia_derrotas(caminhar_borboleta(historico, len(historico) - range_analise, transicoes))
 
 # --- FUNÇÕES VISUAIS AUXILIARES ---
-def calcular_tabela_stress_duque(historico):
-    _, mapa = gerar_universo_duques()
-    tabela = []; total_jogos = len(historico)
-    for nome_setor, lista_duques in mapa.items():
-        atraso = 0
-        for jogo in reversed(historico):
-            if tuple(sorted(jogo)) in lista_duques: break
-            atraso += 1
-        seq_atual_real = 0
-        last_duque = tuple(sorted(historico[-1]))
-        if last_duque in lista_duques:
-            for jogo in reversed(historico):
-                if tuple(sorted(jogo)) in lista_duques: seq_atual_real += 1
-                else: break
-        vitorias_total = 0; max_atraso = 0; curr_atraso = 0; max_seq = 0; curr_seq = 0
-        for jogo in historico:
-            duque = tuple(sorted(jogo))
-            if duque in lista_duques:
-                vitorias_total += 1; curr_seq += 1
-                if curr_atraso > max_atraso: max_atraso = curr_atraso
-                curr_atraso = 0
-            else:
-                if curr_seq > max_seq: max_seq = curr_seq
-                curr_seq = 0; curr_atraso += 1
-        if curr_atraso > max_atraso: max_atraso = curr_atraso
-        if curr_seq > max_seq: max_seq = curr_seq
-        porcentagem = (vitorias_total / total_jogos * 100) if total_jogos > 0 else 0
+def setores_do_historico(historico):
+    # Código do setor (0, 1, 2) de cada jogo: base da tabela de stress e das bolinhas
+    return SETOR_DO_DUQUE[historico]
+
+def corridas(marcas):
+    # Run-length encoding: valor e tamanho de cada corrida de True/False
+    quebras = np.flatnonzero(marcas[1:] != marcas[:-1]) + 1
+    inicios = np.concatenate(([0], quebras))
+    return marcas[inicios], np.diff(np.append(inicios, len(marcas)))
+
+def calcular_tabela_stress_duque(setores):
+    tabela = []; total_jogos = len(setores)
+    for codigo, nome_setor in enumerate(NOMES_SETORES_DUQUE):
+        no_setor = setores == codigo
+        valores, tamanhos = corridas(no_setor) if total_jogos else (np.zeros(0, dtype=bool), np.zeros(0, dtype=int))
+        # A última corrida é a situação atual: sequência se for de acertos, atraso se for de ausências
+        atraso = int(tamanhos[-1]) if total_jogos and not valores[-1] else 0
+        seq_atual_real = int(tamanhos[-1]) if total_jogos and valores[-1] else 0
+        max_atraso = int(tamanhos[~valores].max(initial=0)); max_seq = int(tamanhos[valores].max(initial=0))
+        porcentagem = (int(no_setor.sum()) / total_jogos * 100) if total_jogos > 0 else 0
         tabela.append({ "SETOR": nome_setor, "% PRESENÇA": porcentagem, "ATRASO": atraso, "REC. ATRASO": max_atraso, "SEQ. ATUAL": seq_atual_real, "REC. SEQ. (V)": max_seq })
     return pd.DataFrame(tabela)
 
-def gerar_bolinhas_recentes_duque(historico):
-    _, mapa = gerar_universo_duques()
+def gerar_bolinhas_recentes_duque(setores):
     html = "<div>"
-    for duque in reversed(historico[-12:]):
-        duque_sorted = tuple(sorted(duque))
-        classe = "bola-s1"; letra = "?"
-        if duque_sorted in mapa["SETOR 1 (S1)"]: classe = "bola-s1"; letra = "S1"
-        elif duque_sorted in mapa["SETOR 2 (S2)"]: classe = "bola-s2"; letra = "S2"
-        elif duque_sorted in mapa["SETOR 3 (S3)"]: classe = "bola-s3"; letra = "S3"
-        html += f"<div class='{classe}'>{letra}</div>"
+    for codigo in setores[-12:][::-1]:
+        html += f"<div class='bola-s{codigo + 1}'>S{codigo + 1}</div>"
     html += "</div>"
     return html
 
@@ -501,32 +643,34 @@ with st.sidebar:
 
 historico, ultimo_horario_salvo, ultima_data_salva = carregar_dados()
 st.title(f"👑 {CONFIG_BANCA['display_name']}")
+mostrar_situacao_fila(aba_aberta("TRADICIONAL"))
 
 if len(historico) > 50:
-    ult = historico[-1]
+    ult = duque_do_id(historico[-1])
     st.caption(f"📅 Último Registro: {ultima_data_salva} ({ultimo_horario_salvo}) -> {ult[0]:02}-{ult[1]:02} | Total Jogos: {len(historico)}")
     
     aba_radar, aba_borboleta = st.tabs(["📡 RADAR & SNIPER", "🔮 EFEITO BORBOLETA"])
     
     # --- ABA 1: RADAR & SNIPER ---
     with aba_radar:
-        is_sequencia = verificar_sequencia_bichos(ult)
+        sniper_200, tipo_sniper = gerar_sniper(historico)
+        is_sequencia = tipo_sniper == "SEQUÊNCIA"
         if is_sequencia:
-            sniper_200 = gerar_sniper_sequencia_v8(historico)
             modo_sniper = "SEQUÊNCIA (V8)"; css_sniper = "sniper-box-seq"; desc_sniper = "⚠️ Padrão Raro Detectado! Eliminando 75 duques improváveis."
         else:
-            sniper_200 = gerar_sniper_top200_v6(historico)
             modo_sniper = "NORMAL (V6)"; css_sniper = "sniper-box"; desc_sniper = "Estratégia Camaleão: Adaptação ao último resultado."
 
-        df_stress_real = calcular_tabela_stress_duque(historico)
+        setores_duque = setores_do_historico(historico)
+        df_stress_real = calcular_tabela_stress_duque(setores_duque)
         bt_results = executar_backtest_duque(historico)
         max_loss_rec = calcular_max_derrotas_duque(historico)
+        max_loss_total = recorde_derrotas_duque(historico, memoria_recorde_duque())
 
         if is_sequencia:
             st.markdown(f"<div class='box-padrao-raro'><h2>⚠️ PADRÃO DE SEQUÊNCIA DETECTADO ({ult[0]}-{ult[1]})</h2><p>DICA DO ROBÔ: Aposte em pares espalhados!</p></div>", unsafe_allow_html=True)
 
         st.markdown(f"<div class='{css_sniper}'><div class='sniper-title'>🎯 SNIPER DUQUE ({modo_sniper})</div><div class='sniper-desc'>{desc_sniper}</div></div>", unsafe_allow_html=True)
-        st.markdown(f"<div style='text-align:center;'><span class='max-loss-info'>📉 Pior Sequência (50 Jogos): {max_loss_rec} Derrotas</span></div>", unsafe_allow_html=True)
+        st.markdown(f"<div style='text-align:center;'><span class='max-loss-info'>📉 Pior Sequência (50 Jogos): {max_loss_rec} Derrotas | Histórico Todo: {max_loss_total}</span></div>", unsafe_allow_html=True)
         
         if bt_results:
             cards_html = ""
@@ -560,7 +704,7 @@ if len(historico) > 50:
 
         st.markdown("---")
         st.subheader("📡 Gráfico de Setores")
-        st.markdown("**Visual Recente (⬅️ Mais Novo):**"); st.markdown(gerar_bolinhas_recentes_duque(historico), unsafe_allow_html=True); st.markdown("<br>", unsafe_allow_html=True)
+        st.markdown("**Visual Recente (⬅️ Mais Novo):**"); st.markdown(gerar_bolinhas_recentes_duque(setores_duque), unsafe_allow_html=True); st.markdown("<br>", unsafe_allow_html=True)
         df_chart = df_stress_real.rename(columns={"% PRESENÇA": "PRESENCA", "SETOR": "CATEGORIA"})
         base = alt.Chart(df_chart).encode(theta=alt.Theta("PRESENCA", stack=True))
         pie = base.mark_arc(outerRadius=120, innerRadius=60).encode(
@@ -581,9 +725,14 @@ if len(historico) > 50:
         """, unsafe_allow_html=True)
         
         with st.spinner("Viajando no tempo..."):
-            palpite_borboleta, num_ocorrencias, indices_encontrados = gerar_palpite_eco_historico(historico, 125)
-            bt_borboleta = executar_backtest_borboleta(historico)
-            max_loss_borboleta = calcular_max_derrotas_borboleta(historico)
+            memoria_indice = memoria_ocorrencias()
+            with memoria_indice["lock"]:
+                indice_duques = atualizar_indice_ocorrencias(memoria_indice["indice"], historico)
+                transicoes_duques = atualizar_tensor_transicoes(memoria_indice["transicoes"], historico)
+                palpite_borboleta, num_ocorrencias, indices_encontrados = gerar_palpite_eco_historico(historico, 125, indice_duques, transicoes_duques)
+                df_seguidores = seguidores_ranqueados(transicoes_duques["contagem"], historico[-1])
+                bt_borboleta = executar_backtest_borboleta(historico, transicoes_duques)
+                max_loss_borboleta = calcular_max_derrotas_borboleta(historico, transicoes=transicoes_duques)
             
         # Formata a lista de linhas para exibição (Adiciona +2 para bater com a planilha real)
         linhas_formatadas = ", ".join([str(i + 2) for i in indices_encontrados])
@@ -603,5 +752,9 @@ if len(historico) > 50:
         st.markdown(f"**📜 Palpite Eco Histórico ({len(palpite_borboleta)} Pares):**")
         st.code(formatar_palpite_texto(palpite_borboleta), language="text")
 
+        with st.expander("📊 Seguidores Mais Frequentes do Gatilho", expanded=False):
+            if df_seguidores.empty: st.write("O gatilho ainda não tem seguidores no histórico.")
+            else: st.table(df_seguidores.set_index("DUQUE"))
+
 else:
     st.warning("⚠️ Base de dados insuficiente para o Sniper e Backtest. Adicione pelo menos 50 resultados na barra lateral.")
@@ -8,6 +8,7 @@ import math
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from itertools import combinations
+from espelho_local import espelhar
 
 # =============================================================================
 # --- 1. CONFIGURAÇÕES E CSS DE GLASSMORPHISM (V65.51) ---
@@ -93,7 +94,7 @@ def carregar_dados_em_memoria(banca_nome):
     sh = conectar_sheets()
     if not sh: return pd.DataFrame()
     try:
-        ws = sh.worksheet(MAPA_ABAS[banca_nome])
+        ws = espelhar(sh.worksheet(MAPA_ABAS[banca_nome]))
         dados = ws.get_all_values()
         if len(dados) < 2: return pd.DataFrame()
         df = pd.DataFrame(dados[1:])
@@ -616,7 +617,7 @@ elif menu == "📡 Extração Central":
             res = extrair_dia(banca_ex, dt)
             if res:
                 sh = conectar_sheets()
-                ws = sh.worksheet(MAPA_ABAS[banca_ex])
+                ws = espelhar(sh.worksheet(MAPA_ABAS[banca_ex]))
                 existentes = ws.get_all_values()
                 set_exist = {f"{str(r[0]).strip()}_{''.join(str(x).strip() for x in r[2:7])}" for r in existentes if len(r) >= 7}
                 p_ins = [l for l in res if f"{str(l[0]).strip()}_{''.join(str(x).strip() for x in l[2:7])}" not in set_exist]
@@ -637,7 +638,7 @@ elif menu == "📡 Extração Central":
                 for banca_alvo in BANCAS_CONFIG.keys():
                     res = extrair_dia(banca_alvo, dt)
                     if res:
-                        ws = sh.worksheet(MAPA_ABAS[banca_alvo])
+                        ws = espelhar(sh.worksheet(MAPA_ABAS[banca_alvo]))
                         existentes = ws.get_all_values()
                         set_exist = {f"{str(r[0]).strip()}_{''.join(str(x).strip() for x in r[2:7])}" for r in existentes if len(r) >= 7}
                         p_ins = [l for l in res if f"{str(l[0]).strip()}_{''.join(str(x).strip() for x in l[2:7])}" not in set_exist]
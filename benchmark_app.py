@@ -0,0 +1,121 @@
+import ast
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+from datetime import datetime
+
+# =============================================================================
+# --- 1. CONFIGURAÇÕES DO BENCHMARK ---
+# =============================================================================
+ARQUIVO_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+ARQUIVO_SAIDA_PADRAO = "benchmark_app.json"
+
+# Funções do app.py medidas (nome -> chamada sobre o histórico)
+FUNCOES_MEDIDAS = {
+    "gerar_backtest_e_status": lambda app, h: app.gerar_backtest_e_status(h),
+    "gerar_backtest_setorizado": lambda app, h: app.gerar_backtest_setorizado(h),
+    "gerar_backtest_bma": lambda app, h: app.gerar_backtest_bma(h),
+    "analisar_dna_fixo_historico": lambda app, h: app.analisar_dna_fixo_historico(h),
+    "analisar_ciclo_atual": lambda app, h: app.analisar_ciclo_atual(h),
+    "analisar_setores_bma_com_maximo": lambda app, h: app.analisar_setores_bma_com_maximo(h),
+}
+
+# =============================================================================
+# --- 2. CARGA HEADLESS DO APP.PY ---
+# =============================================================================
+def carregar_motor_app(caminho=ARQUIVO_APP):
+    # O app.py desenha a interface no nível do módulo; aqui só entram imports,
+    # funções e constantes em MAIÚSCULAS, sem executar nada do Streamlit.
+    with open(caminho, encoding="utf-8") as f: arvore = ast.parse(f.read(), caminho)
+    corpo = []
+    for no in arvore.body:
+        if isinstance(no, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)): corpo.append(no)
+        elif isinstance(no, ast.Assign) and all(isinstance(a, ast.Name) and a.id.isupper() for a in no.targets): corpo.append(no)
+    modulo = types.ModuleType("motor_app")
+    modulo.__file__ = caminho
+    exec(compile(ast.Module(body=corpo, type_ignores=[]), caminho, "exec"), modulo.__dict__)
+    return modulo
+
+# =============================================================================
+# --- 3. HISTÓRICO SINTÉTICO ---
+# =============================================================================
+def gerar_historico_sintetico(tamanho, vies=0.0, semente=42):
+    # vies = 0 -> 25 grupos equiprováveis; vies = 1 -> grupo 1 sai 2x mais que o grupo 25 (rampa linear)
+    rng = random.Random(semente)
+    pesos = [1.0 + vies * (25 - g) / 24 for g in range(1, 26)]
+    return rng.choices(range(1, 26), weights=pesos, k=tamanho)
+
+# =============================================================================
+# --- 4. MEDIÇÃO ---
+# =============================================================================
+def medir(funcao, app, historico, repeticoes=1):
+    # Tempo sem tracemalloc (ele deixa o código mais lento); pico de memória numa rodada separada
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(app, historico)
+        tempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    funcao(app, historico)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(tempos), pico / (1024 * 1024)
+
+def rodar_benchmark(tamanhos, vies=0.0, repeticoes=1, funcoes=None):
+    app = carregar_motor_app()
+    resultados = []
+    for tamanho in tamanhos:
+        historico = gerar_historico_sintetico(tamanho, vies)
+        for nome, funcao in FUNCOES_MEDIDAS.items():
+            if funcoes and nome not in funcoes: continue
+            segundos, pico_mb = medir(funcao, app, historico, repeticoes)
+            resultados.append({"funcao": nome, "sorteios": tamanho, "segundos": round(segundos, 6), "pico_mb": round(pico_mb, 3)})
+            print(f"{nome:<34} {tamanho:>9} sorteios  {segundos:>10.4f} s  {pico_mb:>9.2f} MB", flush=True)
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "vies": vies,
+        "repeticoes": repeticoes,
+        "resultados": resultados
+    }
+
+def comparar_com_base(atual, base, tolerancia):
+    # Aponta toda função/tamanho que ficou mais lenta que base * tolerancia
+    tempos_base = {(r["funcao"], r["sorteios"]): r["segundos"] for r in base["resultados"]}
+    regressoes = []
+    for r in atual["resultados"]:
+        anterior = tempos_base.get((r["funcao"], r["sorteios"]))
+        if anterior and r["segundos"] > anterior * tolerancia:
+            regressoes.append(f"{r['funcao']} @ {r['sorteios']}: {anterior:.4f}s -> {r['segundos']:.4f}s")
+    return regressoes
+
+# =============================================================================
+# --- 5. LINHA DE COMANDO ---
+# =============================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das estratégias do app.py com histórico sintético.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--vies", type=float, default=0.0)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--funcoes", nargs="+", choices=list(FUNCOES_MEDIDAS.keys()))
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA_PADRAO)
+    parser.add_argument("--base", help="JSON de uma rodada anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=1.5)
+    args = parser.parse_args()
+
+    relatorio = rodar_benchmark(args.tamanhos, args.vies, args.repeticoes, args.funcoes)
+    with open(args.saida, "w", encoding="utf-8") as f: json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {args.saida}")
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f: base = json.load(f)
+        regressoes = comparar_com_base(relatorio, base, args.tolerancia)
+        for linha in regressoes: print(f"REGRESSÃO: {linha}")
+        if regressoes: sys.exit(1)
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import requests
 from bs4 import BeautifulSoup
@@ -8,6 +9,7 @@ import math
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
+from espelho_local import espelhar, aguardar_sincronizacao
 
 # =============================================================================
 # --- 1. CONFIGURAÇÕES INICIAIS E TELEGRAM ---
@@ -288,7 +290,7 @@ def rodar_drone():
     
     for banca_nome, aba_nome in MAPA_ABAS.items():
         res = extrair_dia(banca_nome, dt)
-        ws = sh.worksheet(aba_nome)
+        ws = espelhar(sh.worksheet(aba_nome))
         if res:
             existentes = ws.get_all_values()
             set_exist = {f"{str(r[0]).strip()}_{''.join(str(x).strip() for x in r[2:7])}" for r in existentes if len(r) >= 7}
@@ -301,6 +303,11 @@ def rodar_drone():
             df = df[df["P1"].astype(str).str.strip() != ""]
             dados_bancas[banca_nome] = df
 
+    # O runner é descartável: a fila de gravações precisa chegar na planilha antes de seguir
+    if not aguardar_sincronizacao():
+        print("❌ Espelho: gravações pendentes não confirmadas na planilha.")
+        sys.exit(1)
+
     if dados_bancas:
         verificar_relatorio_matinal(dados_bancas)
 
@@ -0,0 +1,352 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+# =============================================================================
+# --- ESPELHO LOCAL DA CENTRALBICHOS (SQLITE + ESCRITA ASSÍNCRONA) ---
+# =============================================================================
+# Cada aba da planilha ganha uma cópia local (memória + SQLite). As leituras dos
+# apps saem da cópia; appends entram na cópia na hora e vão para o Google Sheets
+# numa fila persistente processada por uma thread de fundo. Exclusões são síncronas
+# e conferidas com a planilha antes (número de linha não se reaplica às cegas).
+# A conferência com a planilha é pela contagem de linhas + última linha (a "chave"):
+# só a cauda nova é baixada, e qualquer divergência dispara uma recarga completa da aba.
+#
+# Um envio que falhou só é repetido depois de conferir a cauda da planilha (a resposta
+# pode ter se perdido com as linhas já gravadas). Se a aba continua falhando por
+# PRAZO_FALHA, a operação sai da fila para a tabela `falhas`, a aba volta a ser
+# conferida com a planilha e os apps avisam quais linhas não foram gravadas.
+#
+# Cada app tem o seu arquivo (espelho_central_<app>.db) e a fila é reivindicada
+# com BEGIN IMMEDIATE + prazo de reserva: mesmo dividindo o arquivo (ESPELHO_BANCO),
+# dois processos nunca enviam a mesma operação ao mesmo tempo.
+#
+# AbaEspelhada imita os métodos do gspread.Worksheet usados nos apps
+# (get_all_values, get, col_values, batch_get, append_row, append_rows,
+# delete_rows), então basta envolver a aba com espelhar(ws).
+# Só usa biblioteca padrão: roda no Streamlit e no drone (GitHub Actions).
+
+NOME_APP = os.path.splitext(os.path.basename(sys.argv[0] or ""))[0] or "app"
+CAMINHO_BANCO = os.environ.get("ESPELHO_BANCO", f"espelho_central_{NOME_APP}.db")
+TTL_CONFERENCIA = 60       # segundos entre conferências da cauda com a planilha
+ESPERA_TRABALHADOR = 5     # segundos entre tentativas de envio da fila
+PRAZO_RESERVA = 120        # segundos até uma operação reivindicada (processo que caiu) voltar à fila
+ESPERA_EXCLUSAO = 30       # segundos para a fila da aba chegar na planilha antes de uma exclusão
+PRAZO_FALHA = 900          # segundos falhando até a operação sair da fila (vai para `falhas`)
+MARGEM_CONFERENCIA = 5     # linhas antes da posição esperada lidas ao conferir um reenvio
+COLUNA_FINAL = "Z"
+
+class DivergenciaEspelho(Exception):
+    # A planilha mudou por fora: a cópia foi recarregada e a operação não foi feita
+    pass
+
+def normalizar_linha(valores):
+    # Formato em que a API devolve as células: texto, sem vazios no fim da linha
+    linha = ["" if v is None else (("TRUE" if v else "FALSE") if isinstance(v, bool) else str(v)) for v in valores]
+    while linha and linha[-1] == "": linha.pop()
+    return linha
+
+def coluna_para_indice(letras):
+    indice = 0
+    for c in letras: indice = indice * 26 + (ord(c) - 64)
+    return indice
+
+class EspelhoLocal:
+    def __init__(self, caminho=CAMINHO_BANCO):
+        self.lock = threading.RLock()
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS linhas (aba TEXT, n INTEGER, valores TEXT, PRIMARY KEY (aba, n)) WITHOUT ROWID")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS pendentes (id INTEGER PRIMARY KEY AUTOINCREMENT, aba TEXT, operacao TEXT, dados TEXT)")
+        colunas = {c[1] for c in self.conexao.execute("PRAGMA table_info(pendentes)")}
+        for coluna, tipo in (("dono", "TEXT"), ("reservado_em", "REAL"), ("tentativas", "INTEGER DEFAULT 0"), ("ultimo_erro", "TEXT"), ("primeira_falha", "REAL")):
+            if coluna not in colunas: self.conexao.execute(f"ALTER TABLE pendentes ADD COLUMN {coluna} {tipo}")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS falhas (id INTEGER PRIMARY KEY AUTOINCREMENT, aba TEXT, dados TEXT, erro TEXT, em REAL)")
+        self.conexao.commit()
+        self.dono = uuid.uuid4().hex  # Identifica as reservas deste processo na fila
+        self.remotas = {}      # chave da aba -> gspread.Worksheet usado para enviar a fila
+        self.memoria = {}      # chave da aba -> lista de linhas (cópia quente do SQLite)
+        self.sinal = threading.Event()
+        threading.Thread(target=self.rodar_trabalhador, daemon=True).start()
+
+    # --- Cópia local ---
+    def linhas(self, aba):
+        with self.lock:
+            if aba not in self.memoria:
+                cursor = self.conexao.execute("SELECT valores FROM linhas WHERE aba = ? ORDER BY n", (aba,))
+                self.memoria[aba] = [json.loads(v) for (v,) in cursor]
+            return self.memoria[aba]
+
+    def substituir(self, aba, linhas):
+        with self.lock:
+            self.conexao.execute("DELETE FROM linhas WHERE aba = ?", (aba,))
+            self.conexao.executemany("INSERT INTO linhas VALUES (?, ?, ?)", [(aba, n, json.dumps(l, ensure_ascii=False)) for n, l in enumerate(linhas, start=1)])
+            self.conexao.commit()
+            self.memoria[aba] = linhas
+
+    def anexar(self, aba, novas):
+        with self.lock:
+            atuais = self.linhas(aba); inicio = len(atuais) + 1
+            self.conexao.executemany("INSERT OR REPLACE INTO linhas VALUES (?, ?, ?)", [(aba, n, json.dumps(l, ensure_ascii=False)) for n, l in enumerate(novas, start=inicio)])
+            self.conexao.commit()
+            atuais.extend(novas)
+            return inicio
+
+    def remover(self, aba, inicio, fim):
+        with self.lock:
+            atuais = self.linhas(aba)
+            if fim >= len(atuais):
+                self.conexao.execute("DELETE FROM linhas WHERE aba = ? AND n >= ?", (aba, inicio))
+                self.conexao.commit()
+                del atuais[inicio - 1:]
+            else: self.substituir(aba, atuais[:inicio - 1] + atuais[fim:])
+
+    # --- Fila de escrita (persistente) ---
+    def enfileirar(self, aba, operacao, dados):
+        with self.lock:
+            self.conexao.execute("INSERT INTO pendentes (aba, operacao, dados) VALUES (?, ?, ?)", (aba, operacao, json.dumps(dados, ensure_ascii=False, default=str)))
+            self.conexao.commit()
+        self.sinal.set()
+
+    def total_pendentes(self, aba=None):
+        with self.lock:
+            if aba is None: return self.conexao.execute("SELECT COUNT(*) FROM pendentes").fetchone()[0]
+            return self.conexao.execute("SELECT COUNT(*) FROM pendentes WHERE aba = ?", (aba,)).fetchone()[0]
+
+    def reivindicar(self, bloqueadas):
+        # Pega, numa transação exclusiva, a operação mais antiga de uma aba que ninguém está
+        # enviando (ou cuja reserva venceu). A ordem por aba se mantém: só a primeira da fila sai.
+        with self.lock:
+            agora = time.time()
+            self.conexao.execute("BEGIN IMMEDIATE")
+            try:
+                primeiras = self.conexao.execute(
+                    "SELECT p.id, p.aba, p.operacao, p.dados, p.dono, p.reservado_em, p.tentativas, p.primeira_falha FROM pendentes p "
+                    "WHERE p.id = (SELECT MIN(id) FROM pendentes WHERE aba = p.aba) ORDER BY p.id").fetchall()
+                for id_op, aba, operacao, dados, dono, reservado_em, tentativas, primeira_falha in primeiras:
+                    if aba in bloqueadas or aba not in self.remotas: continue
+                    if dono is not None and agora - (reservado_em or 0) < PRAZO_RESERVA: continue
+                    self.conexao.execute("UPDATE pendentes SET dono = ?, reservado_em = ? WHERE id = ?", (self.dono, agora, id_op))
+                    self.conexao.commit()
+                    # Incerta: já falhou (ou o dono caiu no meio do envio), as linhas podem ter chegado
+                    return id_op, aba, operacao, json.loads(dados), bool(tentativas) or dono is not None, primeira_falha
+                self.conexao.commit()
+                return None
+            except Exception:
+                self.conexao.rollback(); raise
+
+    def ja_na_planilha(self, aba, dados):
+        # As linhas do append já estão na cauda da planilha (a partir da posição em que foram
+        # gravadas localmente, com folga para exclusões feitas por fora)?
+        linhas = [normalizar_linha(l) for l in dados["linhas"]]
+        inicio = max(1, dados.get("linha", 1) - MARGEM_CONFERENCIA)
+        cauda = [normalizar_linha(r) for r in self.remotas[aba].batch_get([f"A{inicio}:{COLUNA_FINAL}"])[0]]
+        return any(cauda[i:i + len(linhas)] == linhas for i in range(len(cauda) - len(linhas) + 1))
+
+    def enviar_pendentes(self):
+        # Envia em ordem; uma falha trava só aquela aba até a próxima rodada
+        bloqueadas = set()
+        while True:
+            pedido = self.reivindicar(bloqueadas)
+            if pedido is None: return
+            id_op, aba, operacao, dados, incerta, primeira_falha = pedido
+            try:
+                # Só appends vão pela fila; exclusões posicionais de versões antigas são descartadas
+                if operacao == "append" and not (incerta and self.ja_na_planilha(aba, dados)):
+                    self.remotas[aba].append_rows(dados["linhas"], value_input_option=dados["modo"])
+                with self.lock:
+                    self.conexao.execute("DELETE FROM pendentes WHERE id = ? AND dono = ?", (id_op, self.dono))
+                    self.conexao.commit()
+            except Exception as erro:
+                bloqueadas.add(aba)
+                self.registrar_falha(id_op, aba, dados, f"{type(erro).__name__}: {erro}", primeira_falha)
+
+    def registrar_falha(self, id_op, aba, dados, erro, primeira_falha):
+        # Guarda o erro na operação; falhando há mais de PRAZO_FALHA ela sai da fila para `falhas`
+        # (a aba deixa de ficar presa: a conferência com a planilha volta a rodar)
+        agora = time.time()
+        with self.lock:
+            if primeira_falha is not None and agora - primeira_falha > PRAZO_FALHA:
+                self.conexao.execute("INSERT INTO falhas (aba, dados, erro, em) VALUES (?, ?, ?, ?)", (aba, json.dumps(dados, ensure_ascii=False), erro, agora))
+                self.conexao.execute("DELETE FROM pendentes WHERE id = ? AND dono = ?", (id_op, self.dono))
+            else:
+                self.conexao.execute(
+                    "UPDATE pendentes SET dono = NULL, reservado_em = NULL, tentativas = COALESCE(tentativas, 0) + 1, ultimo_erro = ?, "
+                    "primeira_falha = COALESCE(primeira_falha, ?) WHERE id = ? AND dono = ?", (erro, agora, id_op, self.dono))
+            self.conexao.commit()
+
+    def situacao(self, aba):
+        # Para os avisos dos apps: gravações na fila, último erro de envio e linhas que desistiram
+        with self.lock:
+            pendentes, erro = self.conexao.execute(
+                "SELECT COUNT(*), (SELECT ultimo_erro FROM pendentes WHERE aba = ? AND ultimo_erro IS NOT NULL ORDER BY id LIMIT 1) "
+                "FROM pendentes WHERE aba = ?", (aba, aba)).fetchone()
+            falhas = [l for (d,) in self.conexao.execute("SELECT dados FROM falhas WHERE aba = ? ORDER BY id", (aba,)) for l in json.loads(d)["linhas"]]
+        return {"pendentes": pendentes, "erro": erro, "falhas": falhas}
+
+    def dispensar_falhas(self, aba):
+        with self.lock:
+            self.conexao.execute("DELETE FROM falhas WHERE aba = ?", (aba,))
+            self.conexao.commit()
+
+    def rodar_trabalhador(self):
+        while True:
+            self.sinal.wait(ESPERA_TRABALHADOR)
+            self.sinal.clear()
+            try: self.enviar_pendentes()
+            except Exception: pass  # Erro do próprio SQLite: a fila fica intacta para a próxima rodada
+
+    def aguardar(self, timeout=60, aba=None):
+        # Acorda o trabalhador com espera crescente: uma aba falhando não vira rajada de tentativas
+        limite = time.time() + timeout; espera = 0.2
+        while self.total_pendentes(aba) and time.time() < limite:
+            self.sinal.set(); time.sleep(min(espera, max(limite - time.time(), 0)))
+            espera = min(espera * 2, ESPERA_TRABALHADOR)
+        return self.total_pendentes(aba) == 0
+
+class AbaEspelhada:
+    def __init__(self, espelho, worksheet):
+        self.espelho = espelho
+        self.remota = worksheet
+        self.title = worksheet.title
+        self.id = worksheet.id
+        self.chave = f"{getattr(worksheet, 'spreadsheet_id', '')}:{worksheet.title}"
+        self.ultima_conferencia = 0.0
+        espelho.remotas[self.chave] = worksheet
+
+    # --- Conferência com a planilha (contagem + última linha) ---
+    def sincronizar(self, forcar=False):
+        if not forcar and time.time() - self.ultima_conferencia < TTL_CONFERENCIA: return
+        if self.espelho.total_pendentes(self.chave): return  # A planilha ainda vai receber a fila: não compara agora
+        with self.espelho.lock:
+            locais = self.espelho.linhas(self.chave)
+            total = len(locais)
+        # As chamadas de rede ficam fora do lock; antes de aplicar, confere se ninguém gravou no meio
+        if total:
+            cauda = [normalizar_linha(r) for r in self.remota.batch_get([f"A{total}:{COLUNA_FINAL}"])[0]]
+            if cauda and cauda[0] == locais[-1]:
+                with self.espelho.lock:
+                    if len(self.espelho.linhas(self.chave)) != total or self.espelho.total_pendentes(self.chave): return
+                    if len(cauda) > 1: self.espelho.anexar(self.chave, cauda[1:])
+                self.ultima_conferencia = time.time()
+                return
+        completas = [normalizar_linha(r) for r in self.remota.get_all_values()]
+        with self.espelho.lock:
+            if len(self.espelho.linhas(self.chave)) != total or self.espelho.total_pendentes(self.chave): return
+            self.espelho.substituir(self.chave, completas)
+        self.ultima_conferencia = time.time()
+
+    # --- Situação da fila (avisos nos apps) ---
+    def situacao_fila(self):
+        return self.espelho.situacao(self.chave)
+
+    def dispensar_falhas(self):
+        self.espelho.dispensar_falhas(self.chave)
+        self.ultima_conferencia = 0.0
+
+    # --- Leituras (compatíveis com gspread) ---
+    def get_all_values(self, *args, **kwargs):
+        self.sincronizar()
+        with self.espelho.lock:
+            linhas = self.espelho.linhas(self.chave)
+            largura = max((len(l) for l in linhas), default=0)
+            return [l + [""] * (largura - len(l)) for l in linhas]
+
+    def recortar(self, intervalo):
+        # Intervalos A1 simples: "A:B", "A5:C", "B2:D10"
+        m = re.fullmatch(r"(?:.+!)?([A-Z]+)(\d*):([A-Z]+)(\d*)", intervalo.strip())
+        if not m: raise ValueError(f"Intervalo não suportado no espelho: {intervalo}")
+        col_ini, lin_ini, col_fim, lin_fim = m.groups()
+        c0 = coluna_para_indice(col_ini) - 1; c1 = coluna_para_indice(col_fim)
+        self.sincronizar()
+        with self.espelho.lock:
+            linhas = self.espelho.linhas(self.chave)
+            r0 = int(lin_ini) - 1 if lin_ini else 0
+            r1 = int(lin_fim) if lin_fim else len(linhas)
+            recorte = [normalizar_linha(l[c0:c1]) for l in linhas[r0:r1]]
+        while recorte and not recorte[-1]: recorte.pop()
+        return recorte
+
+    def get(self, intervalo, **kwargs):
+        return self.recortar(intervalo)
+
+    def batch_get(self, intervalos, **kwargs):
+        return [self.recortar(i) for i in intervalos]
+
+    def col_values(self, coluna, **kwargs):
+        self.sincronizar()
+        with self.espelho.lock:
+            valores = [l[coluna - 1] if len(l) >= coluna else "" for l in self.espelho.linhas(self.chave)]
+        while valores and valores[-1] == "": valores.pop()
+        return valores
+
+    # --- Escritas (locais na hora, planilha pela fila) ---
+    def append_rows(self, valores, value_input_option="RAW", **kwargs):
+        self.sincronizar()
+        with self.espelho.lock:
+            inicio = self.espelho.anexar(self.chave, [normalizar_linha(v) for v in valores])
+            self.espelho.enfileirar(self.chave, "append", {"linhas": [list(v) for v in valores], "modo": value_input_option, "linha": inicio})
+        fim = inicio + len(valores) - 1
+        return {"updates": {"updatedRange": f"{self.title}!A{inicio}:{COLUNA_FINAL}{fim}", "updatedRows": len(valores)}}
+
+    def append_row(self, valores, value_input_option="RAW", **kwargs):
+        return self.append_rows([valores], value_input_option)
+
+    def delete_rows(self, inicio, fim=None):
+        # Síncrono: a fila da aba vai antes, e a planilha a partir de `inicio` precisa ser
+        # exatamente a cópia local. Se não for, recarrega e levanta DivergenciaEspelho.
+        fim = fim or inicio
+        erro = self.espelho.situacao(self.chave)["erro"]
+        if erro: raise RuntimeError(f"Fila da aba travada ({erro}); exclusão cancelada.")
+        if not self.espelho.aguardar(ESPERA_EXCLUSAO, self.chave): raise RuntimeError("Fila da aba não chegou na planilha; exclusão cancelada.")
+        remotas = [normalizar_linha(r) for r in self.remota.batch_get([f"A{inicio}:{COLUNA_FINAL}"])[0]]
+        with self.espelho.lock:
+            locais = list(self.espelho.linhas(self.chave)[inicio - 1:])
+            while locais and not locais[-1]: locais.pop()
+            while remotas and not remotas[-1]: remotas.pop()
+            if remotas == locais and fim - inicio < len(locais):
+                self.remota.delete_rows(inicio, fim)
+                self.espelho.remover(self.chave, inicio, fim)
+                return
+        self.sincronizar(forcar=True)
+        raise DivergenciaEspelho(f"{self.title}: linhas a partir de {inicio} mudaram na planilha.")
+
+# =============================================================================
+# --- PONTO DE ENTRADA ---
+# =============================================================================
+ESTADO_GLOBAL = {"lock": threading.Lock(), "espelho": None, "abas": {}}
+
+def obter_espelho():
+    with ESTADO_GLOBAL["lock"]:
+        if ESTADO_GLOBAL["espelho"] is None: ESTADO_GLOBAL["espelho"] = EspelhoLocal()
+        return ESTADO_GLOBAL["espelho"]
+
+def espelhar(worksheet):
+    # Uma AbaEspelhada por aba no processo; a aba remota é atualizada a cada chamada
+    if worksheet is None: return None
+    espelho = obter_espelho()
+    chave = f"{getattr(worksheet, 'spreadsheet_id', '')}:{worksheet.title}"
+    with ESTADO_GLOBAL["lock"]:
+        aba = ESTADO_GLOBAL["abas"].get(chave)
+        if aba is None:
+            aba = AbaEspelhada(espelho, worksheet)
+            ESTADO_GLOBAL["abas"][chave] = aba
+        else:
+            aba.remota = worksheet; espelho.remotas[chave] = worksheet
+    espelho.sinal.set()
+    return aba
+
+def aba_aberta(titulo):
+    # A AbaEspelhada já aberta neste processo com esse título (para avisos sem reabrir a planilha)
+    with ESTADO_GLOBAL["lock"]:
+        return next((aba for aba in ESTADO_GLOBAL["abas"].values() if aba.title == titulo), None)
+
+def aguardar_sincronizacao(timeout=60):
+    # Para scripts que terminam (drone): garante que a fila chegou na planilha
+    if ESTADO_GLOBAL["espelho"] is None: return True
+    return ESTADO_GLOBAL["espelho"].aguardar(timeout)
@@ -7,6 +7,7 @@ from bs4 import BeautifulSoup
 import re
 from datetime import datetime, date, timedelta
 import time
+from espelho_local import espelhar
 
 # =============================================================================
 # CONFIGURAÇÕES
@@ -41,7 +42,7 @@ def conectar_planilha(nome_aba):
         except:
             ws = sh.add_worksheet(title=nome_aba, rows=1000, cols=10)
             ws.append_row(["DATA", "HORARIO", "P1", "P2", "P3", "P4", "P5"])
-        return ws
+        return espelhar(ws)
     return None
 
 def montar_url_correta(slug, data_alvo):
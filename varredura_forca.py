@@ -0,0 +1,137 @@
+import argparse
+import csv
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmark_app import carregar_motor_app, gerar_historico_sintetico
+
+# =============================================================================
+# --- 1. CONFIGURAÇÕES DA VARREDURA ---
+# =============================================================================
+# O ranking de força do app.py usa janela curta 10 (peso 2.0), janela longa 50
+# (peso 1.0) e palpite com K=12. Aqui a grade inteira é avaliada de uma vez.
+JANELAS_CURTAS_PADRAO = [5, 10, 15, 20]
+JANELAS_LONGAS_PADRAO = [30, 50, 100, 200]
+PESOS_CURTOS_PADRAO = [1.0, 2.0, 3.0]
+PESOS_LONGOS_PADRAO = [1.0]
+ARQUIVO_SAIDA_PADRAO = "varredura_forca.csv"
+GRUPOS = np.arange(1, 26)
+
+# =============================================================================
+# --- 2. HISTÓRICO ---
+# =============================================================================
+def ler_historico_arquivo(caminho):
+    # CSV exportado da aba (grupo na coluna A); linhas sem grupo válido são ignoradas
+    historico = []
+    with open(caminho, encoding="utf-8") as f:
+        for linha in csv.reader(f):
+            if linha and linha[0].strip().isdigit() and 1 <= int(linha[0]) <= 25: historico.append(int(linha[0]))
+    return historico
+
+# =============================================================================
+# --- 3. MOTOR VETORIZADO ---
+# =============================================================================
+def contagens_acumuladas(historico):
+    # acumulado[t, g-1] = quantas vezes o grupo g saiu em historico[:t]
+    uma_quente = np.zeros((len(historico) + 1, 25), dtype=np.int32)
+    uma_quente[np.arange(1, len(historico) + 1), np.asarray(historico) - 1] = 1
+    return np.cumsum(uma_quente, axis=0)
+
+def contagem_janela(acumulado, t, janela):
+    # Contagem dos últimos `janela` sorteios antes de cada t (igual a Counter(historico[:t][-janela:]))
+    return acumulado[t] - acumulado[np.maximum(t - janela, 0)]
+
+def posicao_do_sorteado(scores, sorteados):
+    # Posição do grupo sorteado no ranking (0 = primeiro), com o mesmo desempate do
+    # sorted estável do app: empate de score fica com o grupo de número menor na frente.
+    score_sorteado = scores[np.arange(len(sorteados)), sorteados - 1][:, None]
+    acima = (scores > score_sorteado).sum(axis=1)
+    empatados_antes = ((scores == score_sorteado) & (GRUPOS[None, :] < sorteados[:, None])).sum(axis=1)
+    return acima + empatados_antes
+
+def taxas_por_k(posicao):
+    # Acerta com K quem ficou nas posições 0..K-1: um bincount serve para todos os K
+    if not len(posicao): return np.zeros(25)
+    return np.cumsum(np.bincount(posicao, minlength=26)[:25]) / len(posicao)
+
+def maior_sequencia_por_k(posicao):
+    # Maior sequência de derrotas = maior buraco entre dois acertos consecutivos
+    maximos = np.zeros(25, dtype=int)
+    for k in range(1, 26):
+        acertos = np.flatnonzero(posicao < k)
+        maximos[k - 1] = (np.diff(np.concatenate(([-1], acertos, [len(posicao)]))) - 1).max()
+    return maximos
+
+def varrer_configuracoes(historico, curtas, longas, pesos_curtos, pesos_longos, inicio=None, casas=4):
+    # Avalia todas as combinações (curta, longa, pesos) e todos os K de 1 a 25 sobre historico[inicio:]
+    # casas=None devolve as taxas sem arredondar (para conferências exatas)
+    arredondar = (lambda x: x) if casas is None else (lambda x: round(x, casas))
+    if inicio is None: inicio = max(longas)
+    sorteados = np.asarray(historico[inicio:])
+    t = np.arange(inicio, len(historico))
+    acumulado = contagens_acumuladas(historico)
+    janelas = {j: contagem_janela(acumulado, t, j) for j in set(curtas) | set(longas)}
+    ks = np.arange(1, 26)
+    linhas = []
+    for curta, longa, peso_curto, peso_longo in itertools.product(curtas, longas, pesos_curtos, pesos_longos):
+        if curta >= longa: continue
+        scores = janelas[curta] * peso_curto + janelas[longa] * peso_longo
+        posicao = posicao_do_sorteado(scores, sorteados)
+        posicao[t == 0] = 25  # Sem histórico o app não palpita nada
+        taxas = taxas_por_k(posicao)
+        max_derrotas = maior_sequencia_por_k(posicao)
+        for k in ks:
+            linhas.append({
+                "curta": curta, "longa": longa, "peso_curto": peso_curto, "peso_longo": peso_longo, "k": int(k),
+                "taxa_acerto": arredondar(float(taxas[k - 1])),
+                "vantagem": arredondar(float(taxas[k - 1]) - k / 25),
+                "max_derrotas": int(max_derrotas[k - 1])
+            })
+    return pd.DataFrame(linhas)
+
+# =============================================================================
+# --- 4. CONFERÊNCIA COM O APP.PY ---
+# =============================================================================
+def conferir_com_app(historico, inicio):
+    # A configuração do app (10/50, 2.0/1.0, K=12) precisa bater com a caminhada TOP 12 do app.py;
+    # as taxas são comparadas sem arredondar (arredondar antes cria divergência falsa em x.xxxx5)
+    app = carregar_motor_app()
+    acertos, _, _ = app.caminhar_estrategias(historico, inicio, ["TOP 12"])
+    esperado = np.mean(acertos["TOP 12"]) if acertos["TOP 12"] else 0.0
+    max_loss, _ = app.calcular_recordes(acertos["TOP 12"])
+    tabela = varrer_configuracoes(historico, [10], [50], [2.0], [1.0], inicio, casas=None)
+    linha = tabela[tabela["k"] == 12].iloc[0]
+    return abs(linha["taxa_acerto"] - esperado) < 1e-9 and linha["max_derrotas"] == max_loss
+
+# =============================================================================
+# --- 5. LINHA DE COMANDO ---
+# =============================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Varredura de janelas, pesos e K do ranking de força do app.py.")
+    parser.add_argument("--arquivo", help="CSV com o grupo na coluna A (ex: aba exportada); sem ele usa histórico sintético")
+    parser.add_argument("--sorteios", type=int, default=10_000, help="Tamanho do histórico sintético")
+    parser.add_argument("--vies", type=float, default=0.0)
+    parser.add_argument("--curtas", type=int, nargs="+", default=JANELAS_CURTAS_PADRAO)
+    parser.add_argument("--longas", type=int, nargs="+", default=JANELAS_LONGAS_PADRAO)
+    parser.add_argument("--pesos-curtos", type=float, nargs="+", default=PESOS_CURTOS_PADRAO)
+    parser.add_argument("--pesos-longos", type=float, nargs="+", default=PESOS_LONGOS_PADRAO)
+    parser.add_argument("--inicio", type=int, help="Primeiro sorteio avaliado (padrão: maior janela longa)")
+    parser.add_argument("--top", type=int, default=20, help="Quantas configurações mostrar")
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA_PADRAO)
+    parser.add_argument("--conferir", action="store_true", help="Confere 10/50, 2.0/1.0, K=12 contra a caminhada do app.py")
+    args = parser.parse_args()
+
+    historico = ler_historico_arquivo(args.arquivo) if args.arquivo else gerar_historico_sintetico(args.sorteios, args.vies)
+    inicio = args.inicio if args.inicio is not None else max(args.longas)
+    comeco = time.perf_counter()
+    tabela = varrer_configuracoes(historico, args.curtas, args.longas, args.pesos_curtos, args.pesos_longos, inicio)
+    segundos = time.perf_counter() - comeco
+    tabela = tabela.sort_values(["vantagem", "max_derrotas"], ascending=[False, True])
+    tabela.to_csv(args.saida, index=False)
+    print(f"{len(tabela)} configurações sobre {len(historico) - inicio} sorteios em {segundos:.2f} s -> {args.saida}")
+    print(tabela.head(args.top).to_string(index=False))
+
+    if args.conferir: print("Conferência com app.py:", "OK" if conferir_com_app(historico, inicio) else "DIVERGENTE")